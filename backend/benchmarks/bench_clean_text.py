@@ -0,0 +1,43 @@
+"""Micro-benchmark for PDFService.clean_text against the original implementation.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_clean_text [paper.pdf ...]
+
+Defaults to uploads/file.pdf. Every page is checked for identical output before timing.
+"""
+import re
+import sys
+import timeit
+import unicodedata
+import fitz
+from src.services.pdf_service import PDFService
+
+
+def reference_clean_text(text: str) -> str:
+    text = ''.join(ch for ch in text if unicodedata.category(ch)[0] != 'C')
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+def main(paths):
+    for path in paths:
+        with fitz.open(path) as doc:
+            pages = [page.get_text() for page in doc]
+
+        for number, page in enumerate(pages, start=1):
+            expected = reference_clean_text(page)
+            actual = PDFService.clean_text(page, repair_ligatures=False, repair_hyphenation=False)
+            if actual != expected:
+                raise SystemExit(f"{path}: output differs on page {number}")
+
+        runs = 20
+        reference = min(timeit.repeat(lambda: [reference_clean_text(p) for p in pages], number=runs, repeat=3)) / runs
+        fast = min(timeit.repeat(lambda: [PDFService.clean_text(p, False, False) for p in pages], number=runs, repeat=3)) / runs
+        chars = sum(len(p) for p in pages)
+        print(f"{path}: {len(pages)} pages, {chars} chars")
+        print(f"  reference  {reference * 1000:8.2f} ms/doc")
+        print(f"  clean_text {fast * 1000:8.2f} ms/doc  ({reference / fast:.1f}x faster, identical output)")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:] or ["uploads/file.pdf"])
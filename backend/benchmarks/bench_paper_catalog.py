@@ -0,0 +1,122 @@
+"""Import and query benchmark for the local arXiv paper catalog.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_paper_catalog [2000000 ...]
+
+Builds a throwaway catalog of N synthetic papers per run, with Zipf-distributed words
+so common and rare terms behave like real abstracts, using the same bulk import as a
+metadata dump into an empty catalog (import time includes generating the papers).
+Reports import throughput and database size, search latency for rare, common and
+multi-word queries, and the time to apply an incremental update of 1% of the papers.
+Search latency should stay in single-digit milliseconds as N grows.
+"""
+import asyncio
+import itertools
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from src.services.paper_catalog import PaperCatalog
+
+VOCABULARY_SIZE = 50000
+TITLE_WORDS = 10
+ABSTRACT_WORDS = 150
+AUTHOR_POOL = 200000
+QUERIES_PER_KIND = 50
+SEED = 1234
+
+
+def make_word(index: int) -> str:
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    word = ""
+    index += 26 * 26
+    while index:
+        index, rest = divmod(index, 26)
+        word += letters[rest]
+    return word
+
+
+class Corpus:
+    def __init__(self):
+        self.random = random.Random(SEED)
+        self.words = [make_word(i) for i in range(VOCABULARY_SIZE)]
+        self.cum_weights = list(itertools.accumulate(1 / rank for rank in range(1, VOCABULARY_SIZE + 1)))
+        self.authors = [f"{make_word(i)} {make_word(i * 7 + 3)}" for i in range(AUTHOR_POOL)]
+
+    def text(self, count: int) -> str:
+        return " ".join(self.random.choices(self.words, cum_weights=self.cum_weights, k=count))
+
+    def paper(self, number: int, updated: str = "2024-01-01"):
+        return {
+            "arxiv_id": f"{2000 + number // 100000:04d}.{number % 100000:05d}",
+            "title": self.text(TITLE_WORDS),
+            "summary": self.text(ABSTRACT_WORDS),
+            "authors": self.random.sample(self.authors, self.random.randint(1, 6)),
+            "categories": ["cs.CL", "cs.LG"],
+            "primary_category": "cs.CL",
+            "published": "2024-01-01T00:00:00Z",
+            "updated": updated,
+            "abs_url": None,
+            "pdf_url": None,
+            "doi": None,
+        }
+
+    def queries(self):
+        return {
+            "rare term": [self.words[self.random.randrange(20000, VOCABULARY_SIZE)] for _ in range(QUERIES_PER_KIND)],
+            "common term": [self.words[self.random.randrange(10, 100)] for _ in range(QUERIES_PER_KIND)],
+            "three terms": [" ".join(self.words[self.random.randrange(100, 5000)] for _ in range(3))
+                            for _ in range(QUERIES_PER_KIND)],
+            "author": [self.random.choice(self.authors) for _ in range(QUERIES_PER_KIND)],
+        }
+
+
+async def time_queries(catalog: PaperCatalog, queries):
+    for kind, texts in queries.items():
+        timings = []
+        found = 0
+        for text in texts:
+            start = time.perf_counter()
+            found += len(await catalog.search(text))
+            timings.append((time.perf_counter() - start) * 1000)
+        timings.sort()
+        print(f"{kind:>12}: p50 {statistics.median(timings):7.2f} ms  p95 {timings[int(len(timings) * 0.95)]:7.2f} ms  "
+              f"max {timings[-1]:7.2f} ms  avg results {found / len(texts):5.1f}")
+
+
+def run(count: int):
+    corpus = Corpus()
+    with tempfile.TemporaryDirectory() as directory:
+        catalog = PaperCatalog(os.path.join(directory, "catalog.sqlite3"))
+        catalog.open()
+
+        start = time.perf_counter()
+        catalog.bulk_import(corpus.paper(number) for number in range(count))
+        imported = time.perf_counter() - start
+        start = time.perf_counter()
+        catalog.optimize()
+        optimized = time.perf_counter() - start
+        size = sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory)) / 1024 ** 2
+        print(f"N={count}: imported in {imported:.1f} s ({count / imported:,.0f} papers/s), "
+              f"optimized in {optimized:.1f} s, {size:,.0f} MB on disk")
+
+        asyncio.run(time_queries(catalog, corpus.queries()))
+
+        # A newer dump touches a few papers; unchanged ones are skipped by the upsert
+        updates = [corpus.paper(number, updated="2024-06-01") for number in random.Random(SEED).sample(range(count), count // 100)]
+        start = time.perf_counter()
+        catalog.import_papers(updates)
+        print(f"incremental update of {len(updates)} papers in {time.perf_counter() - start:.2f} s")
+        asyncio.run(catalog.cleanup())
+
+
+def main(counts):
+    for count in counts:
+        run(count)
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [2000000])
@@ -0,0 +1,63 @@
+"""Regression benchmark for RAGService.retrieve_document point lookups.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_retrieve_document [10000 100000 ...]
+
+Fills a throwaway collection with N documents using precomputed embeddings, so no
+embedding model is loaded, then times cold hits and repeated misses. Lookup time
+should stay flat as N grows.
+"""
+import asyncio
+import random
+import sys
+import tempfile
+import time
+from src.services.rag_service import RAGService
+
+DIMENSIONS = 8
+LOOKUPS = 200
+
+
+async def fill(service: RAGService, count: int):
+    batch_size = service.client.get_max_batch_size()
+    for start in range(0, count, batch_size):
+        ids = [f"doc_{i}" for i in range(start, min(start + batch_size, count))]
+        await asyncio.to_thread(
+            service.collection.add,
+            ids=ids,
+            documents=[f"Document body {doc_id}" for doc_id in ids],
+            embeddings=[[random.random() for _ in range(DIMENSIONS)] for _ in ids],
+            metadatas=[{"content_hash": doc_id} for doc_id in ids]
+        )
+
+
+async def bench(count: int):
+    with tempfile.TemporaryDirectory() as path:
+        service = RAGService(storage_path=path)
+        await service.initialize()
+        await fill(service, count)
+
+        ids = [f"doc_{random.randrange(count)}" for _ in range(LOOKUPS)]
+        service.cache.clear()
+        start = time.perf_counter()
+        for doc_id in ids:
+            assert await service.retrieve_document(doc_id) is not None
+        hit = (time.perf_counter() - start) / LOOKUPS
+
+        start = time.perf_counter()
+        for _ in range(LOOKUPS):
+            assert await service.retrieve_document("missing_doc") is None
+        miss = (time.perf_counter() - start) / LOOKUPS
+
+        print(f"{count:>8} docs: hit {hit * 1000:7.3f} ms  repeated miss {miss * 1000:7.3f} ms")
+        await service.cleanup()
+
+
+async def main(counts):
+    for count in counts:
+        await bench(count)
+
+
+if __name__ == "__main__":
+    asyncio.run(main([int(arg) for arg in sys.argv[1:]] or [10_000, 100_000]))
@@ -0,0 +1,88 @@
+"""Accuracy-parity and speed check for the ONNX reranker backend against PyTorch.
+
+Run from the backend directory:
+
+    python -m benchmarks.check_reranker_parity [paper.pdf ...]
+
+Defaults to uploads/file.pdf. The PDF is chunked as on upload and every query below is
+scored against all chunks by both backends. Reports the largest score difference,
+Spearman correlation and top-k overlap per query, plus load time, peak RSS growth and
+scoring time per backend. Exits non-zero when the mean top-k overlap falls below
+MIN_TOP_K_OVERLAP.
+"""
+import resource
+import sys
+import time
+import fitz
+from scipy.stats import spearmanr
+from src.config import Config
+from src.services.pdf_service import PDFService
+from src.services.reranker import OnnxCrossEncoder, TorchCrossEncoder
+
+QUERIES = [
+    "What problem does the paper address?",
+    "Which datasets were used in the experiments?",
+    "How does the proposed method compare to the baselines?",
+    "What are the limitations of this approach?",
+    "Which model architecture is used?",
+]
+MIN_TOP_K_OVERLAP = 0.9
+
+
+def load_passages(paths):
+    passages = []
+    for path in paths:
+        with fitz.open(path) as doc:
+            pages = [PDFService.clean_text(page.get_text()) for page in doc]
+        passages.extend(split.page_content for split in PDFService.split_pages(pages))
+    return passages
+
+
+def peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def load(backend_class):
+    # ONNX is loaded first, so its peak RSS growth is not hidden by PyTorch's
+    rss = peak_rss_mb()
+    start = time.perf_counter()
+    model = backend_class(Config.RERANK_MODEL, threads=Config.RERANK_TORCH_THREADS)
+    print(f"{backend_class.__name__:>18}: loaded in {time.perf_counter() - start:6.2f} s, "
+          f"peak RSS +{peak_rss_mb() - rss:7.1f} MB")
+    return model
+
+
+def score_all(model, passages):
+    start = time.perf_counter()
+    scores = [model.predict([(query, passage) for passage in passages], Config.RERANK_BATCH_SIZE) for query in QUERIES]
+    elapsed = time.perf_counter() - start
+    pairs = len(QUERIES) * len(passages)
+    print(f"{type(model).__name__:>18}: {pairs} pairs in {elapsed:6.2f} s ({elapsed / pairs * 1000:.2f} ms/pair)")
+    return scores
+
+
+def main(paths):
+    passages = load_passages(paths)
+    top_k = Config.RERANK_TOP_K
+    onnx_scores = score_all(load(OnnxCrossEncoder), passages)
+    torch_scores = score_all(load(TorchCrossEncoder), passages)
+
+    overlaps = []
+    for query, expected, actual in zip(QUERIES, torch_scores, onnx_scores):
+        top_expected = sorted(range(len(passages)), key=expected.__getitem__, reverse=True)[:top_k]
+        top_actual = sorted(range(len(passages)), key=actual.__getitem__, reverse=True)[:top_k]
+        overlap = len(set(top_expected) & set(top_actual)) / len(top_expected)
+        overlaps.append(overlap)
+        max_diff = max(abs(a - b) for a, b in zip(expected, actual))
+        print(f"max |diff| {max_diff:6.3f}  spearman {spearmanr(expected, actual).statistic:6.4f}  "
+              f"top-{top_k} overlap {overlap:4.2f}  {query}")
+
+    mean_overlap = sum(overlaps) / len(overlaps)
+    print(f"mean top-{top_k} overlap: {mean_overlap:.3f} over {len(passages)} passages")
+    if mean_overlap < MIN_TOP_K_OVERLAP:
+        print(f"FAIL: ONNX backend ranking diverges from PyTorch (< {MIN_TOP_K_OVERLAP})")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:] or ["uploads/file.pdf"])
@@ -1,46 +1,53 @@
+import json
 import logging
 from functools import wraps
 from src.config import Config
-from quart import Blueprint, request, jsonify
+from quart import Blueprint, Response, request, jsonify
 from werkzeug.utils import secure_filename
-import os
 from src.services.pdf_service import PDFService
 from src.services.rag_service import RAGService
 from src.services.ai_service import AIService
 from src.services.paper_search_service import PaperSearchService
 from src.services.qna_service import QnAService
 from src.services.crew_service import CrewAIService
+from src.services.llm_executor import LLMQueueFullError
 
 logger = logging.getLogger(__name__)
 api = Blueprint('api', __name__)
 
-# These should be initialized in app.py and passed to the blueprint
+# These should be initialized in src/server.py and passed to the blueprint
 rag_service = None
 crew_service = None
 paper_search_service = None
 qna_service = None
 ai_service = None
 pdf_service = None
+summary_jobs = None
 extract_text_from_pdf = None
 is_valid_pdf = None
 summarize_text = None
 
-def init_services(rag, crew, paper_search, qna, ai, pdf):
-    global rag_service, crew_service, paper_search_service, qna_service, ai_service, pdf_service, extract_text_from_pdf, is_valid_pdf, summarize_text
+def init_services(rag, crew, paper_search, qna, ai, pdf, jobs=None):
+    global rag_service, crew_service, paper_search_service, qna_service, ai_service, pdf_service, summary_jobs, extract_text_from_pdf, is_valid_pdf, summarize_text
     rag_service = rag
     crew_service = crew
     paper_search_service = paper_search
     qna_service = qna
     ai_service = ai
     pdf_service = pdf
+    summary_jobs = jobs
     extract_text_from_pdf = pdf_service.extract_text_from_pdf
     is_valid_pdf = pdf_service.is_valid_pdf
-    summarize_text = ai_service.summarize_text
+    summarize_text = ai_service.get_or_create_summary
     
     
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in Config.ALLOWED_EXTENSIONS
 
+def llm_busy_response(error: LLMQueueFullError):
+    logger.warning(f"Rejecting request under LLM back-pressure: {str(error)}")
+    return jsonify({"error": "The server is busy, please retry later"}), 503, {"Retry-After": str(error.retry_after)}
+
 def validate_input(required_fields):
     def decorator(f):
         @wraps(f)
@@ -55,6 +62,15 @@ def validate_input(required_fields):
     return decorator
 
 
+async def ensure_chunks(doc_id: str, splits):
+    """Chunks a document that was stored before uploads were chunked, so chunk search finds it."""
+    if await rag_service.has_chunks(doc_id):
+        return
+    count = await qna_service.add_to_vector_collection(splits, doc_id)
+    await rag_service.set_chunk_count(doc_id, count)
+    logger.info(f"Backfilled {count} chunks for existing document: {doc_id}")
+
+
 @api.route('/upload', methods=['POST'])
 async def upload_file():
     files = await request.files
@@ -69,19 +85,30 @@ async def upload_file():
     
     if file and allowed_file(file.filename):
         filename = secure_filename(file.filename)
-        filepath = os.path.join(Config.UPLOAD_FOLDER, filename)
-        await file.save(filepath)
         
         try:
-            if not await pdf_service.is_valid_pdf(filepath):
+            # Reject exact duplicates from the raw bytes before any text extraction
+            file_hash = rag_service.compute_file_hash(file.stream)
+            existing_doc = await rag_service.get_document_by_content_hash(file_hash)
+            # Documents stored before uploads were chunked go through processing once more to get their chunks
+            if existing_doc and await rag_service.has_chunks(existing_doc['id']):
+                logger.info(f"File already exists in the system: {existing_doc['id']}")
+                return jsonify({
+                    "message": "File already exists in the system",
+                    "doc_id": existing_doc['id'],
+                    "original_filename": filename
+                }), 200
+
+            # Process the upload from memory; it is never written to UPLOAD_FOLDER
+            file.stream.seek(0)
+            pdf = await pdf_service.process_pdf(file.stream.read(), include_chunks=True)
+            if not pdf['valid']:
                 logger.warning(f"Invalid PDF file attempted: {filename}")
-                os.remove(filepath)
                 return jsonify({"error": "Invalid or corrupted PDF file"}), 400
             
-            text = await pdf_service.extract_text_from_pdf(filepath)
+            text = pdf['text']
             if not text:
                 logger.warning(f"No text extracted from PDF: {filename}")
-                os.remove(filepath)
                 return jsonify({"error": "No text could be extracted from the PDF"}), 400
 
             content_hash = rag_service.compute_content_hash(text)
@@ -89,19 +116,37 @@ async def upload_file():
 
             if existing_doc:
                 logger.info(f"File already exists in the system: {existing_doc['id']}")
+                await ensure_chunks(existing_doc['id'], pdf['chunks'])
                 return jsonify({
                     "message": "File already exists in the system",
                     "doc_id": existing_doc['id'],
                     "original_filename": filename
                 }), 200
 
-            # Extract metadata
-            metadata = await pdf_service.extract_pdf_metadata(filepath)
+            metadata = pdf['metadata']
             metadata['file_name'] = filename
             metadata['content_hash'] = content_hash
+            metadata['page_count'] = pdf['page_count']
 
-            # Store document in RAG service
-            doc_id, is_new, doc_info = await rag_service.store_document(text, filename, metadata)
+            splits = pdf['chunks']
+            metadata['chunks'] = len(splits)
+
+            # Store the parent document for summarization, then its chunks for retrieval
+            doc_id, is_new, doc_info = await rag_service.store_document(text, filename, metadata, file_hash=file_hash)
+            if is_new:
+                try:
+                    await qna_service.add_to_vector_collection(splits, doc_id)
+                except Exception:
+                    await rag_service.delete_document(doc_id)
+                    raise
+                if summary_jobs:
+                    try:
+                        await summary_jobs.enqueue(doc_id)
+                    except Exception as e:
+                        # Summaries are still computed on demand
+                        logger.error(f"Error queueing summary jobs for {doc_id}: {str(e)}")
+            else:
+                await ensure_chunks(doc_id, splits)
             
             action = "stored" if is_new else "updated"
             logger.info(f"File uploaded and {action}: {doc_id}")
@@ -110,28 +155,33 @@ async def upload_file():
                 "doc_id": doc_id,
                 "original_filename": filename
             }), 200
-        except FileNotFoundError:
-            logger.error(f"File not found after saving: {filepath}")
-            return jsonify({"error": "File not found after upload"}), 500
         except ValueError as ve:
             logger.warning(f"Value error processing file: {str(ve)}")
-            if os.path.exists(filepath):
-                os.remove(filepath)
             return jsonify({"error": str(ve)}), 400
         except Exception as e:
             logger.exception(f"Error processing uploaded file: {str(e)}")
-            if os.path.exists(filepath):
-                os.remove(filepath)
             return jsonify({"error": f"Error processing file: {str(e)}"}), 500
-        finally:
-            # Clean up the temporary file
-            if os.path.exists(filepath):
-                os.remove(filepath)
     
     logger.warning(f"Invalid file type attempted: {file.filename}")
     return jsonify({"error": "Invalid file type"}), 400
 
 
+def stream_answer_response(question: str, doc_id, stream_format: str) -> Response:
+    # A client disconnect cancels this generator, which closes the Ollama stream
+    async def generate():
+        async for event, payload in qna_service.stream_answer(question, doc_id):
+            if stream_format == 'sse':
+                yield f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+            else:
+                yield json.dumps({"event": event, "data": payload}) + "\n"
+
+    mimetype = 'text/event-stream' if stream_format == 'sse' else 'application/x-ndjson'
+    response = Response(generate(), mimetype=mimetype)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    response.timeout = None
+    return response
+
 @api.route('/ask_question', methods=['POST'])
 @validate_input(['question'])
 async def ask_question():
@@ -139,6 +189,12 @@ async def ask_question():
     data = await request.json
     question = data['question']
     doc_id = data.get('doc_id')
+    # "sse" or "ndjson" streams stage events and answer tokens as they are produced
+    stream_format = data.get('stream')
+    if stream_format is True or (stream_format is None and 'text/event-stream' in request.headers.get('Accept', '')):
+        stream_format = 'sse'
+    if stream_format not in (None, False, 'sse', 'ndjson'):
+        return jsonify({"error": f"Invalid stream value: {stream_format}"}), 400
     
     try:
         if qna_service is None:
@@ -148,6 +204,11 @@ async def ask_question():
             exists = await qna_service.document_exists(doc_id)
             if not exists:
                 return jsonify({"error": f"Document with ID '{doc_id}' not found"}), 404
+
+        if stream_format:
+            # A full queue is answered with a 503 here; once the 200 has started it can only be an error event
+            qna_service.check_stream_capacity(question, doc_id)
+            return stream_answer_response(question, doc_id, stream_format)
         
         result = await qna_service.answer_question(question, doc_id)
         
@@ -155,6 +216,11 @@ async def ask_question():
             return jsonify(result), 500
         
         return jsonify(result), 200
+    except LLMQueueFullError as e:
+        return llm_busy_response(e)
+    except TimeoutError:
+        logger.error("Answering question timed out")
+        return jsonify({"error": "Answering the question timed out"}), 504
     except Exception as e:
         logger.exception(f"Error answering question: {str(e)}")
         return jsonify({"error": "An unexpected error occurred while processing your question"}), 500
@@ -172,19 +238,44 @@ async def summarize():
         return jsonify({"error": "Invalid summarization level"}), 400
 
     try:
-        text = await rag_service.retrieve_document(doc_id)
-        if not text:
+        doc = await rag_service.retrieve_document(doc_id)
+        if not doc or not doc.get('text'):
             logger.error(f"Document not found in RAG: {doc_id}")
             return jsonify({"error": "Document not found"}), 404
 
-        summary = await ai_service.summarize_text(text, level)
+        summary = await ai_service.get_or_create_summary(doc['text'], level)
         logger.info(f"Successfully summarized document: {doc_id}")
         return jsonify({"summary": summary}), 200
+    except LLMQueueFullError as e:
+        return llm_busy_response(e)
+    except TimeoutError:
+        logger.error(f"Summarization timed out: {doc_id}")
+        return jsonify({"error": "Summarization timed out"}), 504
     except Exception as e:
         logger.exception(f"Error during summarization: {str(e)}")
         return jsonify({"error": "An error occurred during summarization"}), 500
     
 
+@api.route('/summary_jobs', methods=['GET'])
+async def get_summary_jobs():
+    if summary_jobs is None:
+        return jsonify({"error": "Summary precomputation is disabled"}), 404
+    doc_id = request.args.get('doc_id')
+    if not doc_id:
+        return jsonify({"error": "Missing required parameter: doc_id"}), 400
+    jobs = await summary_jobs.get_jobs_for_document(doc_id)
+    return jsonify({"doc_id": doc_id, "jobs": jobs}), 200
+
+@api.route('/summary_jobs/<int:job_id>', methods=['GET'])
+async def get_summary_job(job_id: int):
+    if summary_jobs is None:
+        return jsonify({"error": "Summary precomputation is disabled"}), 404
+    job = await summary_jobs.get_job(job_id)
+    if job is None:
+        return jsonify({"error": f"Job {job_id} not found"}), 404
+    return jsonify(job), 200
+
+
 @api.route('/search_papers', methods=['POST'])
 @validate_input(['query'])
 async def search_papers():
@@ -192,8 +283,8 @@ async def search_papers():
     query = data['query']
     
     try:
-        results = await paper_search_service.search_papers(query)
-        return jsonify({"results": results}), 200
+        results, cache_status = await paper_search_service.search_papers_with_status(query)
+        return jsonify({"results": results, "cache": cache_status}), 200
     except Exception as e:
         logger.exception(f"Error searching papers: {str(e)}")
         return jsonify({"error": "Error searching papers"}), 500
@@ -211,13 +302,13 @@ async def search_author():
         return jsonify({"error": "Invalid summarization level"}), 400
     
     try:
-        results = await paper_search_service.search_author(author_name)
+        results, cache_status = await paper_search_service.search_author_with_status(author_name)
         
         if summarize:
             summary = await paper_search_service.summarize_author_profile(author_name, level)
             results['summary'] = summary
         
-        return jsonify({"results": results}), 200
+        return jsonify({"results": results, "cache": cache_status}), 200
     except Exception as e:
         logger.exception(f"Error searching author: {str(e)}")
         return jsonify({"error": "Error searching author"}), 500
@@ -234,12 +325,17 @@ async def summarize_search():
         return jsonify({"error": "Invalid summarization level"}), 400
     
     try:
-        text = await rag_service.retrieve_document(search_id)
-        if not text:
+        doc = await rag_service.retrieve_document(search_id)
+        if not doc or not doc.get('text'):
             return jsonify({"error": "Search result not found"}), 404
         
-        summary = await summarize_text(text, level)
+        summary = await summarize_text(doc['text'], level)
         return jsonify({"summary": summary}), 200
+    except LLMQueueFullError as e:
+        return llm_busy_response(e)
+    except TimeoutError:
+        logger.error(f"Search summarization timed out: {search_id}")
+        return jsonify({"error": "Summarization timed out"}), 504
     except Exception as e:
         logger.exception(f"Error summarizing search: {str(e)}")
         return jsonify({"error": "Error summarizing search"}), 500
@@ -259,12 +355,61 @@ async def debug_services():
         "pdf_service": str(pdf_service)
     }), 200
     
+@api.route('/debug/llm', methods=['GET'])
+async def debug_llm():
+    return jsonify(crew_service.get_metrics()), 200
+
+@api.route('/debug/summaries', methods=['GET'])
+async def debug_summaries():
+    return jsonify(ai_service.get_metrics()), 200
+
+@api.route('/debug/summary_jobs', methods=['GET'])
+async def debug_summary_jobs():
+    if summary_jobs is None:
+        return jsonify({"enabled": False}), 200
+    return jsonify({"enabled": True, **await summary_jobs.get_metrics()}), 200
+
+@api.route('/debug/search_cache', methods=['GET'])
+async def debug_search_cache():
+    if paper_search_service.search_cache is None:
+        return jsonify({"enabled": False}), 200
+    return jsonify({"enabled": True, **paper_search_service.search_cache.get_metrics()}), 200
+
+@api.route('/debug/embeddings', methods=['GET'])
+async def debug_embeddings():
+    return jsonify(rag_service.embedder.get_metrics()), 200
+
+@api.route('/debug/reranker', methods=['GET'])
+async def debug_reranker():
+    return jsonify(qna_service.reranker.get_metrics()), 200
+
 @api.route('/get_all_documents', methods=['GET'])
 async def get_all_documents():
+    limit = request.args.get('limit', type=int)
+    cursor = request.args.get('cursor', default=0, type=int)
+    fields = request.args.get('fields', default='full')
+    preview_chars = request.args.get('preview_chars', default=Config.DOCUMENT_PREVIEW_CHARS, type=int)
+    response_format = request.args.get('format', default='json')
+
+    if fields not in RAGService.DOCUMENT_FIELDS:
+        return jsonify({"error": f"Invalid fields value: {fields}"}), 400
+    if cursor < 0 or (limit is not None and limit <= 0):
+        return jsonify({"error": "cursor must not be negative and limit must be positive"}), 400
+
+    if response_format == 'ndjson':
+        # Stream every remaining document one page at a time; memory stays flat
+        async def generate():
+            try:
+                async for document in rag_service.iter_documents(cursor, limit, fields, preview_chars):
+                    yield json.dumps(document) + "\n"
+            except Exception as e:
+                logger.exception(f"Error streaming documents: {str(e)}")
+                yield json.dumps({"error": "An unexpected error occurred while streaming documents"}) + "\n"
+        return Response(generate(), mimetype='application/x-ndjson')
+
     try:
-        limit = request.args.get('limit', default=1000, type=int)
-        documents = await rag_service.get_all_documents(limit)
-        return jsonify({"documents": documents}), 200
+        documents, next_cursor = await rag_service.get_documents_page(cursor, limit or 1000, fields, preview_chars)
+        return jsonify({"documents": documents, "next_cursor": next_cursor}), 200
     except Exception as e:
         logger.exception(f"Error retrieving all documents: {str(e)}")
         return jsonify({"error": "An unexpected error occurred while retrieving documents"}), 500
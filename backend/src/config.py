@@ -12,36 +12,113 @@ class Config:
     # File upload settings
     UPLOAD_FOLDER: str = os.getenv('UPLOAD_FOLDER', 'uploads')
     ALLOWED_EXTENSIONS: Set[str] = {'pdf'}
+    PDF_PROCESS_WORKERS: int = int(os.getenv('PDF_PROCESS_WORKERS', str(min(4, os.cpu_count() or 1))))  # 0 disables
+    PDF_PARALLEL_MIN_PAGES: int = int(os.getenv('PDF_PARALLEL_MIN_PAGES', '64'))
+    PDF_REPAIR_LIGATURES: bool = os.getenv('PDF_REPAIR_LIGATURES', 'False').lower() == 'true'
+    PDF_REPAIR_HYPHENATION: bool = os.getenv('PDF_REPAIR_HYPHENATION', 'False').lower() == 'true'
     MAX_CONTENT_LENGTH: int = int(os.getenv('MAX_CONTENT_LENGTH', str(16 * 1024 * 1024)))  # 16 MB default
 
     # RAG settings
     RAG_STORAGE_PATH: str = os.getenv('RAG_STORAGE_PATH', 'rag_db')
-    CHROMA_DB_PATH: str = os.getenv('CHROMA_DB_PATH', './demo-rag-chroma')
     CHROMA_COLLECTION_NAME: str = os.getenv('CHROMA_COLLECTION_NAME', 'research_papers')
+    CHROMA_CHUNK_COLLECTION_NAME: str = os.getenv('CHROMA_CHUNK_COLLECTION_NAME', 'research_paper_chunks')
+    DOCUMENTS_PAGE_SIZE: int = int(os.getenv('DOCUMENTS_PAGE_SIZE', '100'))
+    DOCUMENT_PREVIEW_CHARS: int = int(os.getenv('DOCUMENT_PREVIEW_CHARS', '300'))
+    RAG_MISSING_CACHE_TTL: int = int(os.getenv('RAG_MISSING_CACHE_TTL', '300'))  # seconds
 
     # Paper search settings
     GOOGLE_SCHOLAR_MAX_RESULTS: int = int(os.getenv('GOOGLE_SCHOLAR_MAX_RESULTS', '20'))
     ARXIV_MAX_RESULTS: int = int(os.getenv('ARXIV_MAX_RESULTS', '20'))
     AUTHOR_TOP_CITED_COUNT: int = int(os.getenv('AUTHOR_TOP_CITED_COUNT', '20'))
     AUTHOR_RECENT_PAPERS_COUNT: int = int(os.getenv('AUTHOR_RECENT_PAPERS_COUNT', '20'))
+    ARXIV_API_URL: str = os.getenv('ARXIV_API_URL', 'http://export.arxiv.org/api/query')
+    ARXIV_MAX_PAGES: int = int(os.getenv('ARXIV_MAX_PAGES', '1'))  # pages of ARXIV_MAX_RESULTS entries
+    ARXIV_PAGE_DELAY: float = float(os.getenv('ARXIV_PAGE_DELAY', '3'))  # seconds between pages, per arXiv API terms
+    SEARCH_SOURCE_TIMEOUT: int = int(os.getenv('SEARCH_SOURCE_TIMEOUT', '15'))  # seconds per source
+    SEARCH_BLOCKING_WORKERS: int = int(os.getenv('SEARCH_BLOCKING_WORKERS', '4'))
+    SEARCH_MAX_CONNECTIONS: int = int(os.getenv('SEARCH_MAX_CONNECTIONS', '10'))
+    USE_SEARCH_CACHE: bool = os.getenv('USE_SEARCH_CACHE', 'True').lower() == 'true'
+    SEARCH_CACHE_DB_PATH: str = os.getenv('SEARCH_CACHE_DB_PATH', os.path.join(RAG_STORAGE_PATH, 'search_cache.sqlite3'))
+    SEARCH_CACHE_SIZE: int = int(os.getenv('SEARCH_CACHE_SIZE', '1000'))
+    SEARCH_CACHE_DEFAULT_TTL: int = int(os.getenv('SEARCH_CACHE_DEFAULT_TTL', '3600'))  # seconds
+    SEARCH_CACHE_TTLS: Dict[str, int] = {
+        'google_scholar': int(os.getenv('SEARCH_CACHE_TTL_GOOGLE_SCHOLAR', str(24 * 3600))),
+        'arxiv': int(os.getenv('SEARCH_CACHE_TTL_ARXIV', str(6 * 3600))),
+        'google_scholar_author': int(os.getenv('SEARCH_CACHE_TTL_AUTHOR', str(7 * 24 * 3600))),
+    }
+    SEARCH_CACHE_STALE_TTL: int = int(os.getenv('SEARCH_CACHE_STALE_TTL', str(7 * 24 * 3600)))  # served while refreshing
+    USE_PAPER_CATALOG: bool = os.getenv('USE_PAPER_CATALOG', 'False').lower() == 'true'  # answers searches only after a dump import
+    PAPER_CATALOG_DB_PATH: str = os.getenv('PAPER_CATALOG_DB_PATH', os.path.join(RAG_STORAGE_PATH, 'paper_catalog.sqlite3'))
+    PAPER_CATALOG_MAX_RESULTS: int = int(os.getenv('PAPER_CATALOG_MAX_RESULTS', '20'))
+    PAPER_CATALOG_MIN_RESULTS: int = int(os.getenv('PAPER_CATALOG_MIN_RESULTS', '5'))  # fewer local hits go to live sources
+    PAPER_CATALOG_MAX_CANDIDATES: int = int(os.getenv('PAPER_CATALOG_MAX_CANDIDATES', '1000'))  # newest title matches ranked
+    PAPER_CATALOG_IMPORT_BATCH_SIZE: int = int(os.getenv('PAPER_CATALOG_IMPORT_BATCH_SIZE', '10000'))
 
     # AI settings
     ALLOWED_LEVELS: Set[str] = {'beginner', 'intermediate', 'expert'}
-    SUMMARIZATION_TIMEOUT: int = int(os.getenv('SUMMARIZATION_TIMEOUT', '60'))  # seconds
+    SUMMARIZATION_TIMEOUT: int = int(os.getenv('SUMMARIZATION_TIMEOUT', '60'))  # seconds, per LLM call
+    SUMMARY_TOTAL_TIMEOUT: int = int(os.getenv('SUMMARY_TOTAL_TIMEOUT', '600'))  # seconds, for a whole summary
     USE_SUMMARY_CACHE: bool = os.getenv('USE_SUMMARY_CACHE', 'True').lower() == 'true'
     SUMMARY_CACHE_SIZE: int = int(os.getenv('SUMMARY_CACHE_SIZE', '100'))
-    CHUNK_SIZE = 400
-    CHUNK_OVERLAP = 100
+    SUMMARY_CACHE_DB_PATH: str = os.getenv('SUMMARY_CACHE_DB_PATH', os.path.join(RAG_STORAGE_PATH, 'summary_cache.sqlite3'))
+    SUMMARY_PROMPT_VERSION: str = os.getenv('SUMMARY_PROMPT_VERSION', '1')
+    SUMMARY_STRATEGY: str = os.getenv('SUMMARY_STRATEGY', 'map_reduce')  # 'map_reduce' (full paper) or 'crew' (first 1000 chars)
+    SUMMARY_SECTION_TOKENS: int = int(os.getenv('SUMMARY_SECTION_TOKENS', '2000'))
+    SUMMARY_CHARS_PER_TOKEN: int = int(os.getenv('SUMMARY_CHARS_PER_TOKEN', '4'))  # rough estimate used for token budgets
+    SUMMARY_SECTION_WORDS: int = int(os.getenv('SUMMARY_SECTION_WORDS', '200'))
+    PRECOMPUTE_SUMMARIES: bool = os.getenv('PRECOMPUTE_SUMMARIES', 'False').lower() == 'true'
+    SUMMARY_JOBS_DB_PATH: str = os.getenv('SUMMARY_JOBS_DB_PATH', os.path.join(RAG_STORAGE_PATH, 'summary_jobs.sqlite3'))
+    SUMMARY_JOB_WORKERS: int = int(os.getenv('SUMMARY_JOB_WORKERS', '1'))
+    SUMMARY_JOB_MAX_ATTEMPTS: int = int(os.getenv('SUMMARY_JOB_MAX_ATTEMPTS', '3'))
+    SUMMARY_JOB_RETRY_DELAY: int = int(os.getenv('SUMMARY_JOB_RETRY_DELAY', '30'))  # seconds, doubled per attempt
+    SUMMARY_JOB_POLL_INTERVAL: int = int(os.getenv('SUMMARY_JOB_POLL_INTERVAL', '5'))  # seconds
+    SUMMARY_JOB_PRIORITIES: Dict[str, int] = {'intermediate': 2, 'beginner': 1, 'expert': 0}
+    # Half the LLM workers by default, so one long paper cannot take every slot from interactive requests
+    SUMMARY_MAP_CONCURRENCY: int = int(os.getenv('SUMMARY_MAP_CONCURRENCY', str(max(1, int(os.getenv('LLM_MAX_WORKERS', '2')) // 2))))
+    CHUNK_SIZE: int = int(os.getenv('CHUNK_SIZE', '400'))
+    CHUNK_OVERLAP: int = int(os.getenv('CHUNK_OVERLAP', '100'))
+    EMBEDDING_BATCH_SIZE: int = int(os.getenv('EMBEDDING_BATCH_SIZE', '64'))
+    EMBEDDING_BATCH_WINDOW_MS: int = int(os.getenv('EMBEDDING_BATCH_WINDOW_MS', '5'))
+    EMBEDDING_MAX_CONCURRENCY: int = int(os.getenv('EMBEDDING_MAX_CONCURRENCY', '2'))
+    EMBEDDING_MAX_CONNECTIONS: int = int(os.getenv('EMBEDDING_MAX_CONNECTIONS', '8'))
+    EMBEDDING_REQUEST_TIMEOUT: int = int(os.getenv('EMBEDDING_REQUEST_TIMEOUT', '60'))  # seconds
+    EMBEDDING_CACHE_SIZE: int = int(os.getenv('EMBEDDING_CACHE_SIZE', '10000'))  # float32 vectors: ~30 MB at 768 dims, ~40 MB at 1024
+    USE_EMBEDDING_STORE: bool = os.getenv('USE_EMBEDDING_STORE', 'True').lower() == 'true'
+    RERANK_MODEL: str = os.getenv('RERANK_MODEL', 'cross-encoder/ms-marco-MiniLM-L-6-v2')
+    RERANK_TOP_K: int = int(os.getenv('RERANK_TOP_K', '3'))
+    RERANK_BATCH_SIZE: int = int(os.getenv('RERANK_BATCH_SIZE', '64'))
+    RERANK_MAX_WAIT_MS: int = int(os.getenv('RERANK_MAX_WAIT_MS', '10'))
+    RERANK_BACKEND: str = os.getenv('RERANK_BACKEND', 'torch')  # 'torch' or 'onnx'
+    RERANK_ONNX_FILE: str = os.getenv('RERANK_ONNX_FILE', 'onnx/model_quint8_avx2.onnx')  # file in the model's Hub repo
+    RERANK_ONNX_PATH: str = os.getenv('RERANK_ONNX_PATH', '')  # local .onnx file, overrides RERANK_ONNX_FILE
+    RERANK_MAX_LENGTH: int = int(os.getenv('RERANK_MAX_LENGTH', '512'))
+    RERANK_TORCH_THREADS: int = int(os.getenv('RERANK_TORCH_THREADS', '0'))  # intra-op threads for either backend, 0 keeps the default
+    RERANK_CACHE_SIZE: int = int(os.getenv('RERANK_CACHE_SIZE', '50000'))
 
     # Ollama settings
     OLLAMA_BASE_URL: str = os.getenv('OLLAMA_BASE_URL', 'http://localhost:11434')
     OLLAMA_MODEL: str = os.getenv('OLLAMA_MODEL', 'mistral')
     OLLAMA_API_URL: str = os.getenv('OLLAMA_API_URL', 'http://localhost:11434/api/embeddings')
     OLLAMA_EMBEDDING_MODEL: str = os.getenv('OLLAMA_EMBEDDING_MODEL', 'nomic-embed-text:latest')
+    EMBEDDING_PROVIDER: str = os.getenv('EMBEDDING_PROVIDER', 'default')  # 'default' (Chroma MiniLM) or 'ollama'
+    OLLAMA_NUM_CTX: int = int(os.getenv('OLLAMA_NUM_CTX', '8192'))  # context window in tokens
+    OLLAMA_NUM_PREDICT: int = int(os.getenv('OLLAMA_NUM_PREDICT', '1024'))  # max generated tokens
+    OLLAMA_KEEP_ALIVE: str = os.getenv('OLLAMA_KEEP_ALIVE', '30m')  # how long Ollama keeps the model loaded
+    # 'direct' calls Ollama's chat API, 'crew' goes through a single-agent CrewAI crew
+    QNA_LLM_BACKEND: str = os.getenv('QNA_LLM_BACKEND', 'direct')
+    SEARCH_LLM_BACKEND: str = os.getenv('SEARCH_LLM_BACKEND', 'direct')
     
     
     # CrewAI settings
     CREW_VERBOSE: bool = os.getenv('CREW_VERBOSE', 'False').lower() == 'true'
+
+    # LLM execution settings
+    LLM_MAX_WORKERS: int = int(os.getenv('LLM_MAX_WORKERS', '2'))
+    # Workers background jobs may use at once; one fewer than LLM_MAX_WORKERS keeps a slot for interactive requests
+    LLM_BACKGROUND_WORKERS: int = int(os.getenv('LLM_BACKGROUND_WORKERS', str(max(1, LLM_MAX_WORKERS - 1))))
+    LLM_MAX_QUEUE_SIZE: int = int(os.getenv('LLM_MAX_QUEUE_SIZE', '8'))
+    LLM_REQUEST_TIMEOUT: int = int(os.getenv('LLM_REQUEST_TIMEOUT', '120'))  # seconds
+    LLM_RETRY_AFTER: int = int(os.getenv('LLM_RETRY_AFTER', '5'))  # seconds
     
     ALLOW_CLEAR_ALL_DOCUMENTS = True  # Set to True only in development/testing environments
 
@@ -63,7 +140,6 @@ class Config:
         # Ensure necessary directories exist
         os.makedirs(cls.UPLOAD_FOLDER, exist_ok=True)
         os.makedirs(cls.RAG_STORAGE_PATH, exist_ok=True)
-        os.makedirs(cls.CHROMA_DB_PATH, exist_ok=True)
 
     @classmethod
     def to_dict(cls) -> Dict[str, Any]:
@@ -77,4 +153,62 @@ class Config:
             raise ValueError("MAX_CONTENT_LENGTH must be positive")
         if cls.SUMMARIZATION_TIMEOUT <= 0:
             raise ValueError("SUMMARIZATION_TIMEOUT must be positive")
+        if cls.SUMMARY_TOTAL_TIMEOUT <= 0:
+            raise ValueError("SUMMARY_TOTAL_TIMEOUT must be positive")
+        if cls.SUMMARY_STRATEGY not in {'map_reduce', 'crew'}:
+            raise ValueError("SUMMARY_STRATEGY must be 'map_reduce' or 'crew'")
+        if cls.SUMMARY_SECTION_TOKENS <= 0 or cls.SUMMARY_CHARS_PER_TOKEN <= 0:
+            raise ValueError("SUMMARY_SECTION_TOKENS and SUMMARY_CHARS_PER_TOKEN must be positive")
+        if cls.PRECOMPUTE_SUMMARIES and not cls.USE_SUMMARY_CACHE:
+            # Precomputed summaries are only kept in the summary cache
+            raise ValueError("PRECOMPUTE_SUMMARIES requires USE_SUMMARY_CACHE")
+        if cls.SUMMARY_JOB_WORKERS <= 0:
+            raise ValueError("SUMMARY_JOB_WORKERS must be positive")
+        if cls.SUMMARY_JOB_MAX_ATTEMPTS <= 0:
+            raise ValueError("SUMMARY_JOB_MAX_ATTEMPTS must be positive")
+        if cls.SUMMARY_MAP_CONCURRENCY <= 0:
+            raise ValueError("SUMMARY_MAP_CONCURRENCY must be positive")
+        if cls.EMBEDDING_PROVIDER not in {'default', 'ollama'}:
+            raise ValueError("EMBEDDING_PROVIDER must be 'default' or 'ollama'")
+        if cls.PDF_PROCESS_WORKERS < 0:
+            raise ValueError("PDF_PROCESS_WORKERS must not be negative")
+        if cls.CHUNK_OVERLAP >= cls.CHUNK_SIZE:
+            raise ValueError("CHUNK_OVERLAP must be smaller than CHUNK_SIZE")
+        for name in ('QNA_LLM_BACKEND', 'SEARCH_LLM_BACKEND'):
+            if getattr(cls, name) not in {'direct', 'crew'}:
+                raise ValueError(f"{name} must be 'direct' or 'crew'")
+        if cls.SEARCH_SOURCE_TIMEOUT <= 0:
+            raise ValueError("SEARCH_SOURCE_TIMEOUT must be positive")
+        if cls.ARXIV_MAX_RESULTS <= 0 or cls.ARXIV_MAX_PAGES <= 0:
+            raise ValueError("ARXIV_MAX_RESULTS and ARXIV_MAX_PAGES must be positive")
+        if cls.ARXIV_PAGE_DELAY < 0:
+            raise ValueError("ARXIV_PAGE_DELAY must not be negative")
+        if min(cls.PAPER_CATALOG_MAX_RESULTS, cls.PAPER_CATALOG_MAX_CANDIDATES, cls.PAPER_CATALOG_IMPORT_BATCH_SIZE) <= 0:
+            raise ValueError("PAPER_CATALOG_MAX_RESULTS, PAPER_CATALOG_MAX_CANDIDATES and PAPER_CATALOG_IMPORT_BATCH_SIZE must be positive")
+        if not 1 <= cls.PAPER_CATALOG_MIN_RESULTS <= cls.PAPER_CATALOG_MAX_RESULTS:
+            raise ValueError("PAPER_CATALOG_MIN_RESULTS must be between 1 and PAPER_CATALOG_MAX_RESULTS")
+        if cls.SEARCH_BLOCKING_WORKERS <= 0:
+            raise ValueError("SEARCH_BLOCKING_WORKERS must be positive")
+        if cls.LLM_MAX_WORKERS <= 0:
+            raise ValueError("LLM_MAX_WORKERS must be positive")
+        if not 0 < cls.LLM_BACKGROUND_WORKERS <= cls.LLM_MAX_WORKERS:
+            raise ValueError("LLM_BACKGROUND_WORKERS must be between 1 and LLM_MAX_WORKERS")
+        if cls.LLM_MAX_QUEUE_SIZE < 0:
+            raise ValueError("LLM_MAX_QUEUE_SIZE must not be negative")
+        if cls.LLM_REQUEST_TIMEOUT <= 0:
+            raise ValueError("LLM_REQUEST_TIMEOUT must be positive")
+        if cls.EMBEDDING_BATCH_SIZE <= 0:
+            raise ValueError("EMBEDDING_BATCH_SIZE must be positive")
+        if cls.EMBEDDING_BATCH_WINDOW_MS < 0:
+            raise ValueError("EMBEDDING_BATCH_WINDOW_MS must not be negative")
+        if cls.EMBEDDING_MAX_CONCURRENCY <= 0:
+            raise ValueError("EMBEDDING_MAX_CONCURRENCY must be positive")
+        if cls.RERANK_BACKEND not in {'torch', 'onnx'}:
+            raise ValueError("RERANK_BACKEND must be 'torch' or 'onnx'")
+        if cls.RERANK_BATCH_SIZE <= 0:
+            raise ValueError("RERANK_BATCH_SIZE must be positive")
+        if cls.RERANK_MAX_WAIT_MS < 0:
+            raise ValueError("RERANK_MAX_WAIT_MS must not be negative")
+        if cls.RERANK_TORCH_THREADS < 0:
+            raise ValueError("RERANK_TORCH_THREADS must not be negative")
         # Add more validation as needed
\ No newline at end of file
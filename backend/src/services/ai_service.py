@@ -1,26 +1,50 @@
 import logging
 import asyncio
-from functools import lru_cache
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
+from langchain_text_splitters import RecursiveCharacterTextSplitter
 from src.services.crew_service import CrewAIService
+from src.services.summary_cache import SummaryCache
 from src.config import Config
 
 logger = logging.getLogger(__name__)
 
 class AIService:
+    SECTION_SYSTEM_PROMPT = "You summarize sections of research papers accurately and concisely."
+    SECTION_PROMPT = (
+        "Summarize the following part of a research paper in at most {words} words. "
+        "Keep its key claims, methods, results and any important numbers.\n\n{text}"
+    )
+    COMBINE_PROMPT = (
+        "The following are summaries of consecutive parts of one research paper. "
+        "Merge them into a single summary of at most {words} words without losing key claims, "
+        "methods or results.\n\n{text}"
+    )
+    FINAL_PROMPT = (
+        "Using the material below, which covers the whole research paper, write a summary of the paper "
+        "for a reader at the {level} expertise level. {guidance} Cover the problem, the approach, "
+        "the main results and their significance.\n\n{text}"
+    )
+    LEVEL_GUIDANCE = {
+        'beginner': "Explain concepts clearly, avoid jargon and define any technical terms you need.",
+        'intermediate': "Assume general familiarity with the field and keep technical terms where they help.",
+        'expert': "Go into technical detail, including methodology, assumptions and limitations.",
+    }
+
     def __init__(self, crew_service: CrewAIService):
         self.crew_service = crew_service
         self.summarization_count = 0
-        self.cache_hit_count = 0
+        self.summary_cache = SummaryCache() if Config.USE_SUMMARY_CACHE else None
 
     async def initialize(self):
         logger.info("Initializing AIService...")
-        # Add any initialization logic if needed
+        if self.summary_cache:
+            await self.summary_cache.initialize()
         logger.info("AIService initialized successfully")
 
     async def cleanup(self):
         logger.info("Cleaning up AIService...")
-        # Add any cleanup logic if needed
+        if self.summary_cache:
+            await self.summary_cache.cleanup()
         logger.info("AIService cleaned up")
 
     async def summarize_text(self, text: Any, level: str) -> str:
@@ -37,10 +61,13 @@ class AIService:
             if not isinstance(text, str):
                 text = str(text)
             
-            summary = await asyncio.wait_for(
-                self.crew_service.summarize_with_crew(text, level),
-                timeout=Config.SUMMARIZATION_TIMEOUT
-            )
+            if Config.SUMMARY_STRATEGY == 'crew':
+                summary = await self.crew_service.summarize_with_crew(
+                    text, level, timeout=Config.SUMMARIZATION_TIMEOUT
+                )
+            else:
+                # SUMMARIZATION_TIMEOUT bounds each call; this bounds all the section and merge calls together
+                summary = await asyncio.wait_for(self.summarize_map_reduce(text, level), timeout=Config.SUMMARY_TOTAL_TIMEOUT)
             
             end_time = asyncio.get_event_loop().time()
             duration = end_time - start_time
@@ -57,25 +84,97 @@ class AIService:
             logger.exception(f"Error generating summary with CrewAI: {str(e)}")
             raise
 
-    @lru_cache(maxsize=Config.SUMMARY_CACHE_SIZE)
-    async def _cached_summary(self, text: str, level: str) -> str:
-        return await self.summarize_text(text, level)
-
-    async def get_or_create_summary(self, text: str, level: str) -> str:
+    async def get_or_create_summary(self, text: Any, level: str) -> str:
         """Retrieves a cached summary or generates a new one."""
-        if not Config.USE_SUMMARY_CACHE:
+        if not isinstance(text, str):
+            text = str(text)
+        if not self.summary_cache:
             return await self.summarize_text(text, level)
 
-        cache_key = f"{hash(text)}:{level}"
         try:
-            summary = await self._cached_summary(text, level)
-            logger.info("Returning cached summary")
-            self.cache_hit_count += 1
-            return summary
+            return await self.summary_cache.get_or_compute(
+                text, level, lambda: self.summarize_text(text, level),
+                prompt_version=f"{Config.SUMMARY_PROMPT_VERSION}-{Config.SUMMARY_STRATEGY}"
+            )
         except Exception as e:
             logger.exception(f"Error retrieving/generating summary: {str(e)}")
             raise
 
+    @staticmethod
+    def split_sections(text: str, section_tokens: int = Config.SUMMARY_SECTION_TOKENS) -> List[str]:
+        """Splits text into sections of roughly ``section_tokens`` tokens each."""
+        splitter = RecursiveCharacterTextSplitter(
+            chunk_size=section_tokens * Config.SUMMARY_CHARS_PER_TOKEN,
+            chunk_overlap=0,
+            separators=["\n\n", "\n", ". ", " ", ""]
+        )
+        return splitter.split_text(text)
+
+    async def _complete(self, prompt: str, semaphore: Optional[asyncio.Semaphore] = None,
+                        system_prompt: str = SECTION_SYSTEM_PROMPT) -> str:
+        if semaphore is None:
+            return await self.crew_service.complete(system_prompt, prompt, timeout=Config.SUMMARIZATION_TIMEOUT)
+        async with semaphore:
+            return await self.crew_service.complete(system_prompt, prompt, timeout=Config.SUMMARIZATION_TIMEOUT)
+
+    async def _cached_complete(self, source: str, kind: str, prompt: str, semaphore: asyncio.Semaphore) -> str:
+        """Level-independent intermediate summary of ``source``, cached so every level reuses it."""
+        if not self.summary_cache:
+            return await self._complete(prompt, semaphore)
+        return await self.summary_cache.get_or_compute(source, kind, lambda: self._complete(prompt, semaphore))
+
+    async def summarize_section(self, section: str, semaphore: asyncio.Semaphore) -> str:
+        prompt = self.SECTION_PROMPT.format(words=Config.SUMMARY_SECTION_WORDS, text=section)
+        return await self._cached_complete(section, 'section', prompt, semaphore)
+
+    async def combine_summaries(self, summaries: List[str], semaphore: asyncio.Semaphore) -> str:
+        if len(summaries) == 1:
+            return summaries[0]
+        joined = "\n\n".join(summaries)
+        prompt = self.COMBINE_PROMPT.format(words=Config.SUMMARY_SECTION_WORDS, text=joined)
+        return await self._cached_complete(joined, 'combine', prompt, semaphore)
+
+    async def summarize_map_reduce(self, text: str, level: str) -> str:
+        """Summarizes the whole text hierarchically.
+
+        Sections are summarized concurrently (at most SUMMARY_MAP_CONCURRENCY at a
+        time per document, half the LLM workers by default). Adjacent section
+        summaries are then merged in groups until they fit one section budget,
+        and a final pass writes the level-specific summary.
+        """
+        budget = Config.SUMMARY_SECTION_TOKENS * Config.SUMMARY_CHARS_PER_TOKEN
+        sections = self.split_sections(text)
+        semaphore = asyncio.Semaphore(Config.SUMMARY_MAP_CONCURRENCY)
+        logger.info(f"Summarizing {len(sections)} sections for level: {level}")
+
+        if len(sections) > 1:
+            summaries = await asyncio.gather(*(self.summarize_section(section, semaphore) for section in sections))
+            while len(summaries) > 1 and sum(len(summary) + 2 for summary in summaries) > budget:
+                groups = self._group(summaries, budget)
+                if len(groups) == len(summaries):
+                    break
+                summaries = await asyncio.gather(*(self.combine_summaries(group, semaphore) for group in groups))
+            material = "\n\n".join(summaries)
+        else:
+            material = text
+
+        prompt = self.FINAL_PROMPT.format(level=level, guidance=self.LEVEL_GUIDANCE.get(level, ""), text=material)
+        return await self._complete(prompt, system_prompt="You write clear, accurate summaries of research papers.")
+
+    @staticmethod
+    def _group(summaries: List[str], budget: int) -> List[List[str]]:
+        """Packs consecutive summaries into groups whose joined length stays within ``budget``."""
+        groups: List[List[str]] = []
+        size = 0
+        for summary in summaries:
+            if groups and size + len(summary) + 2 <= budget:
+                groups[-1].append(summary)
+                size += len(summary) + 2
+            else:
+                groups.append([summary])
+                size = len(summary)
+        return groups
+
     async def retry_summarize(self, text: str, level: str, max_retries: int = 3) -> str:
         """Retry summarization with exponential backoff."""
         for attempt in range(max_retries):
@@ -98,7 +197,5 @@ class AIService:
         """Return current metrics."""
         return {
             "total_summarizations": self.summarization_count,
-            "cache_hits": self.cache_hit_count,
-            "cache_hit_rate": self.cache_hit_count / self.summarization_count if self.summarization_count > 0 else 0,
-            "cache_info": self._cached_summary.cache_info() if Config.USE_SUMMARY_CACHE else None
-        }
\ No newline at end of file
+            "cache_info": self.summary_cache.get_metrics() if self.summary_cache else None
+        }
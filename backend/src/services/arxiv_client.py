@@ -0,0 +1,159 @@
+import asyncio
+import logging
+import re
+import time
+from typing import Iterator, List, Optional, Set, Tuple, TypedDict
+import aiohttp
+from lxml import etree
+from src.config import Config
+
+logger = logging.getLogger(__name__)
+
+ATOM = "{http://www.w3.org/2005/Atom}"
+ARXIV = "{http://arxiv.org/schemas/atom}"
+OPENSEARCH = "{http://a9.com/-/spec/opensearch/1.1/}"
+
+
+class ArxivPaper(TypedDict):
+    arxiv_id: str
+    title: str
+    summary: str
+    authors: List[str]
+    categories: List[str]
+    primary_category: Optional[str]
+    published: Optional[str]
+    updated: Optional[str]
+    abs_url: Optional[str]
+    pdf_url: Optional[str]
+    doi: Optional[str]
+
+
+def _text(element: Optional[etree._Element]) -> str:
+    return ' '.join((element.text or '').split()) if element is not None else ''
+
+
+def parse_entry(entry: etree._Element) -> Optional[ArxivPaper]:
+    """Turns one Atom <entry> into a paper record; returns None for the API's error entries."""
+    entry_id = _text(entry.find(f"{ATOM}id"))
+    if '/abs/' not in entry_id:
+        return None
+    links = {link.get('title') or link.get('rel'): link.get('href') for link in entry.iterfind(f"{ATOM}link")}
+    primary = entry.find(f"{ARXIV}primary_category")
+    return {
+        # Without the version suffix, so a revised paper keeps its id
+        "arxiv_id": re.sub(r'v\d+$', '', entry_id.split('/abs/', 1)[1]),
+        "title": _text(entry.find(f"{ATOM}title")),
+        "summary": _text(entry.find(f"{ATOM}summary")),
+        "authors": [_text(author.find(f"{ATOM}name")) for author in entry.iterfind(f"{ATOM}author")],
+        "categories": [category.get('term') for category in entry.iterfind(f"{ATOM}category")],
+        "primary_category": primary.get('term') if primary is not None else None,
+        "published": _text(entry.find(f"{ATOM}published")) or None,
+        "updated": _text(entry.find(f"{ATOM}updated")) or None,
+        "abs_url": links.get('alternate'),
+        "pdf_url": links.get('pdf'),
+        "doi": _text(entry.find(f"{ARXIV}doi")) or None,
+    }
+
+
+class FeedParser:
+    """Incremental parser for an arXiv Atom feed.
+
+    Chunks of the response are fed as they arrive and finished entries are
+    returned straight away. Each parsed entry is removed from the tree, so
+    memory stays flat however large the page is.
+    """
+
+    def __init__(self):
+        self.parser = etree.XMLPullParser(events=('end',), tag=(f"{ATOM}entry", f"{OPENSEARCH}totalResults"))
+        self.total_results: Optional[int] = None
+
+    def feed(self, data: bytes) -> Iterator[ArxivPaper]:
+        self.parser.feed(data)
+        return self._drain()
+
+    def close(self) -> Iterator[ArxivPaper]:
+        self.parser.close()
+        return self._drain()
+
+    def _drain(self) -> Iterator[ArxivPaper]:
+        for _, element in self.parser.read_events():
+            if element.tag == f"{OPENSEARCH}totalResults":
+                self.total_results = int(element.text or 0)
+                continue
+            paper = parse_entry(element)
+            element.clear()
+            while element.getprevious() is not None:
+                del element.getparent()[0]
+            if paper is not None:
+                yield paper
+
+
+def parse_feed(data: bytes) -> Tuple[List[ArxivPaper], Optional[int]]:
+    """Parses a complete feed; returns the papers and the total number of matches."""
+    parser = FeedParser()
+    papers = list(parser.feed(data))
+    papers.extend(parser.close())
+    return papers, parser.total_results
+
+
+class ArxivClient:
+    """Client for the arXiv query API that streams and parses each page of results.
+
+    ``search`` requests ``page_size`` entries at a time and follows the feed's
+    total result count for up to ``max_pages`` pages, waiting ``page_delay``
+    seconds between requests as the API terms ask. Pages that would not start
+    before ``deadline`` are skipped and a page still loading at the deadline is
+    abandoned, so a slow API returns the pages that did arrive.
+    """
+
+    def __init__(self, session: aiohttp.ClientSession, api_url: str = Config.ARXIV_API_URL,
+                 page_size: int = Config.ARXIV_MAX_RESULTS, max_pages: int = Config.ARXIV_MAX_PAGES,
+                 page_delay: float = Config.ARXIV_PAGE_DELAY):
+        self.session = session
+        self.api_url = api_url
+        self.page_size = page_size
+        self.max_pages = max_pages
+        self.page_delay = page_delay
+
+    async def fetch_page(self, query: str, start: int, page_size: int) -> Tuple[List[ArxivPaper], Optional[int]]:
+        params = {"search_query": f"all:{query}", "start": start, "max_results": page_size}
+        parser = FeedParser()
+        papers: List[ArxivPaper] = []
+        async with self.session.get(self.api_url, params=params) as response:
+            response.raise_for_status()
+            async for chunk in response.content.iter_chunked(64 * 1024):
+                papers.extend(parser.feed(chunk))
+        papers.extend(parser.close())
+        return papers, parser.total_results
+
+    async def search(self, query: str, max_results: Optional[int] = None,
+                     deadline: Optional[float] = None) -> List[ArxivPaper]:
+        max_results = max_results or self.page_size * self.max_pages
+        papers: List[ArxivPaper] = []
+        seen: Set[str] = set()
+        start = 0
+        while len(papers) < max_results:
+            if papers:
+                if deadline is not None and time.monotonic() + self.page_delay >= deadline:
+                    logger.warning(f"Stopping arXiv pagination for '{query}' at {len(papers)} results, out of time")
+                    break
+                await asyncio.sleep(self.page_delay)
+            page_size = min(self.page_size, max_results - len(papers))
+            try:
+                page, total = await asyncio.wait_for(
+                    self.fetch_page(query, start, page_size),
+                    timeout=None if deadline is None else max(deadline - time.monotonic(), 0)
+                )
+            except asyncio.TimeoutError:
+                logger.warning(f"arXiv page at offset {start} for '{query}' missed the deadline, "
+                               f"returning {len(papers)} results")
+                break
+            start += len(page)
+            for paper in page:
+                # Results can shift between pages while arXiv updates its index
+                if paper["arxiv_id"] not in seen:
+                    seen.add(paper["arxiv_id"])
+                    papers.append(paper)
+            if len(page) < page_size or (total is not None and start >= total):
+                break
+        return papers[:max_results]
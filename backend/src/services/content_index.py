@@ -0,0 +1,132 @@
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class ContentHashIndex:
+    """Maps content hashes to document ids for O(1) duplicate detection.
+
+    The mapping lives in a dict that is loaded once at ``initialize()`` and is
+    mirrored to a SQLite side table. Every change is committed to SQLite first
+    and applied to the dict only once the transaction succeeds.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self.conn: Optional[sqlite3.Connection] = None
+        self.lock = threading.Lock()
+        self.hash_to_id: Dict[str, str] = {}
+        self.id_to_hashes: Dict[str, Set[str]] = {}
+
+    async def initialize(self):
+        logger.info(f"Loading content hash index from {self.db_path}")
+        await asyncio.to_thread(self._open)
+        logger.info(f"Content hash index loaded with {len(self.hash_to_id)} entries")
+
+    def _open(self):
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        with self.lock, self.conn:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute(
+                """CREATE TABLE IF NOT EXISTS content_hashes (
+                    content_hash TEXT PRIMARY KEY,
+                    doc_id TEXT NOT NULL
+                )"""
+            )
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_content_hashes_doc_id ON content_hashes (doc_id)")
+            rows = self.conn.execute("SELECT content_hash, doc_id FROM content_hashes").fetchall()
+        self.hash_to_id = {}
+        self.id_to_hashes = {}
+        self._apply(rows)
+
+    def _apply(self, entries: List[Tuple[str, str]]):
+        for content_hash, doc_id in entries:
+            previous = self.hash_to_id.get(content_hash)
+            if previous is not None and previous != doc_id:
+                self.id_to_hashes.get(previous, set()).discard(content_hash)
+            self.hash_to_id[content_hash] = doc_id
+            self.id_to_hashes.setdefault(doc_id, set()).add(content_hash)
+
+    async def cleanup(self):
+        if self.conn is not None:
+            with self.lock:
+                self.conn.close()
+            self.conn = None
+        self.hash_to_id = {}
+        self.id_to_hashes = {}
+
+    def __len__(self) -> int:
+        return len(self.hash_to_id)
+
+    def get(self, content_hash: str) -> Optional[str]:
+        if not content_hash:
+            return None
+        return self.hash_to_id.get(content_hash)
+
+    def get_hashes(self, doc_id: str) -> Set[str]:
+        return self.id_to_hashes.get(doc_id, set())
+
+    def _add(self, entries: List[Tuple[str, str]]):
+        with self.lock, self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO content_hashes VALUES (?, ?)", entries)
+        self._apply(entries)
+
+    async def add(self, doc_id: str, hashes: Iterable[Optional[str]]):
+        entries = [(content_hash, doc_id) for content_hash in hashes if content_hash]
+        if entries:
+            await asyncio.to_thread(self._add, entries)
+
+    async def add_many(self, entries: List[Tuple[str, str]]):
+        """Adds (content_hash, doc_id) pairs in one transaction."""
+        entries = [(content_hash, doc_id) for content_hash, doc_id in entries if content_hash]
+        if entries:
+            await asyncio.to_thread(self._add, entries)
+
+    def _forget(self, doc_ids: Iterable[str]):
+        for doc_id in doc_ids:
+            for content_hash in self.id_to_hashes.pop(doc_id, ()):
+                self.hash_to_id.pop(content_hash, None)
+
+    def _remove(self, doc_ids: List[str]):
+        with self.lock, self.conn:
+            self.conn.executemany("DELETE FROM content_hashes WHERE doc_id = ?", [(doc_id,) for doc_id in doc_ids])
+        self._forget(doc_ids)
+
+    async def remove(self, doc_ids: List[str]):
+        if doc_ids:
+            await asyncio.to_thread(self._remove, doc_ids)
+
+    def _replace(self, doc_ids: List[str], entries: List[Tuple[str, str]]):
+        with self.lock, self.conn:
+            self.conn.executemany("DELETE FROM content_hashes WHERE doc_id = ?", [(doc_id,) for doc_id in doc_ids])
+            self.conn.executemany("INSERT OR REPLACE INTO content_hashes VALUES (?, ?)", entries)
+        self._forget(doc_ids)
+        self._apply(entries)
+
+    async def replace(self, entries: List[Tuple[str, str]]):
+        """Makes each (content_hash, doc_id) pair the only entry for its doc_id, in one transaction.
+
+        For documents that were just overwritten: hashes of their old content
+        stop pointing at them in the same step that the new hash is recorded.
+        """
+        doc_ids = list(dict.fromkeys(doc_id for _, doc_id in entries))
+        entries = [(content_hash, doc_id) for content_hash, doc_id in entries if content_hash]
+        if doc_ids:
+            await asyncio.to_thread(self._replace, doc_ids, entries)
+
+    def _clear(self):
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM content_hashes")
+        self.hash_to_id = {}
+        self.id_to_hashes = {}
+
+    async def clear(self):
+        await asyncio.to_thread(self._clear)
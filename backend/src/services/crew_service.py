@@ -1,15 +1,52 @@
+import asyncio
 import logging
-from typing import Tuple, Any, Dict, List
+import queue
+from typing import Tuple, Any, AsyncIterator, Callable, Dict, List, Optional
 from crewai import Task, Agent, Crew, LLM
 import ollama
 from src.config import Config
+from src.services.llm_executor import LLMExecutor, LLMQueueFullError, LLMDeadlineExceededError
 
 logger = logging.getLogger(__name__)
 
 class CrewAIService:
+    AGENT_SPECS: Dict[str, Dict[str, str]] = {
+        'analyst': {
+            'role': 'Research Analyst',
+            'goal': 'Analyze and summarize research paper search results',
+            'backstory': 'You are an expert in analyzing academic literature and identifying key trends and insights.',
+        },
+        'researcher': {
+            'role': 'Researcher',
+            'goal': 'Thoroughly analyze research papers and extract key information',
+            'backstory': 'You are an expert researcher with years of experience in analyzing academic papers across various fields.',
+        },
+        'writer': {
+            'role': 'Technical Writer',
+            'goal': 'Create clear and concise summaries of research papers',
+            'backstory': 'You are a skilled technical writer specializing in transforming complex academic content into accessible summaries.',
+        },
+        'editor': {
+            'role': 'Editor',
+            'goal': 'Ensure the summary is accurate, well-structured, and tailored to the specified expertise level',
+            'backstory': 'You are an experienced editor with a keen eye for detail and a talent for adapting content to different audience levels.',
+        },
+        'profile_analyst': {
+            'role': 'Academic Profile Analyst',
+            'goal': 'Provide a comprehensive and insightful analysis of academic researcher profiles',
+            'backstory': """You are a distinguished expert in analyzing academic profiles and research outputs. 
+                With years of experience in bibliometrics and scientometrics, you excel at identifying key trends, 
+                assessing research impact, and providing nuanced insights into a researcher's career trajectory.""",
+        },
+    }
+
     def __init__(self):
         self.model = Config.OLLAMA_MODEL
         self.llm = self.create_ollama_llm()
+        self.executor = LLMExecutor()
+        # One prebuilt agent set per LLM worker; a set is checked out by the worker thread running a crew
+        self.agent_pool: queue.SimpleQueue = queue.SimpleQueue()
+        self.async_client = ollama.AsyncClient(host=Config.OLLAMA_BASE_URL)
 
     async def initialize(self):
         logger.info("Initializing CrewAI service...")
@@ -28,9 +65,17 @@ class CrewAIService:
                 logger.error(f"Failed to pull and initialize the model: {str(pull_error)}")
                 raise RuntimeError(f"Failed to initialize CrewAI service: {str(pull_error)}")
 
+        try:
+            while self.agent_pool.qsize() < self.executor.max_workers:
+                self.agent_pool.put(await asyncio.to_thread(self.build_agents))
+            logger.info(f"Built {self.agent_pool.qsize()} reusable agent sets")
+        except Exception as e:
+            logger.exception("Error creating agents")
+            raise RuntimeError(f"Error creating agents: {str(e)}")
+
     async def cleanup(self):
         logger.info("Cleaning up CrewAI service...")
-        # Add any cleanup logic if needed
+        await self.executor.cleanup()
         logger.info("CrewAI service cleaned up")
 
     def create_ollama_llm(self):
@@ -39,30 +84,129 @@ class CrewAIService:
             base_url=Config.OLLAMA_BASE_URL,
         )
 
-    async def analyze_with_crew(self, system_prompt: str, user_prompt: str) -> dict:
+    def build_agents(self) -> Dict[str, Agent]:
+        """Builds one agent per role in AGENT_SPECS, all sharing the service's LLM client."""
+        return {
+            name: Agent(allow_delegation=False, llm=self.llm, **spec)
+            for name, spec in self.AGENT_SPECS.items()
+        }
+
+    def _kickoff(self, build_crew: Callable[[Dict[str, Agent]], Crew]) -> Any:
+        """Runs on an LLM worker thread: checks out an agent set, runs the crew and returns the set.
+
+        The set goes back to the pool only when kickoff returns, so a request
+        that hits its deadline never hands out agents that are still running.
+        """
+        try:
+            agents = self.agent_pool.get_nowait()
+        except queue.Empty:
+            logger.warning("Agent pool is empty, building a new agent set")
+            agents = self.build_agents()
+        try:
+            return build_crew(agents).kickoff()
+        finally:
+            if self.agent_pool.qsize() < self.executor.max_workers:
+                self.agent_pool.put(agents)
+
+    @staticmethod
+    def ollama_options() -> Dict[str, Any]:
+        return {"num_ctx": Config.OLLAMA_NUM_CTX, "num_predict": Config.OLLAMA_NUM_PREDICT}
+
+    @staticmethod
+    def chat_messages(system_prompt: str, user_prompt: str) -> List[Dict[str, str]]:
+        return [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt},
+        ]
+
+    async def complete(self, system_prompt: str, user_prompt: str, timeout: Optional[float] = None) -> str:
+        """Single prompt-to-completion call straight to Ollama, without agent scaffolding.
+
+        Shares the LLM executor's concurrency limit and queue with crew calls.
+        """
+        loop = asyncio.get_running_loop()
+        timeout = Config.LLM_REQUEST_TIMEOUT if timeout is None else timeout
+        deadline = loop.time() + timeout
         try:
-            analyst = Agent(
-                role='Research Analyst',
-                goal='Analyze and summarize research paper search results',
-                backstory='You are an expert in analyzing academic literature and identifying key trends and insights.',
-                allow_delegation=False,
-                llm=self.create_ollama_llm(),
+            async with self.executor.slot(timeout):
+                response = await asyncio.wait_for(
+                    self.async_client.chat(
+                        model=self.model,
+                        messages=self.chat_messages(system_prompt, user_prompt),
+                        options=self.ollama_options(),
+                        keep_alive=Config.OLLAMA_KEEP_ALIVE
+                    ),
+                    timeout=max(deadline - loop.time(), 0)
+                )
+            return response['message']['content']
+        except asyncio.TimeoutError:
+            logger.warning(f"Direct LLM request exceeded its {timeout:.1f}s deadline")
+            raise LLMDeadlineExceededError(f"LLM request exceeded its {timeout:.1f}s deadline")
+        except (LLMQueueFullError, LLMDeadlineExceededError):
+            raise
+        except Exception as e:
+            logger.exception(f"Error in direct LLM completion: {str(e)}")
+            raise RuntimeError(f"Error in direct LLM completion: {str(e)}")
+
+    async def analyze(self, system_prompt: str, user_prompt: str, backend: str = 'direct', timeout: Optional[float] = None) -> dict:
+        """Runs a single-agent prompt on the chosen backend: 'direct' (plain Ollama chat) or 'crew'."""
+        if backend == 'crew':
+            return await self.analyze_with_crew(system_prompt, user_prompt, timeout=timeout)
+        return {"result": await self.complete(system_prompt, user_prompt, timeout=timeout)}
+
+    def check_capacity(self):
+        """Raises ``LLMQueueFullError`` if the LLM queue would reject a request now."""
+        self.executor.check_capacity()
+
+    async def stream_chat(self, system_prompt: str, user_prompt: str, timeout: Optional[float] = None) -> AsyncIterator[str]:
+        """Streams the model's reply token by token from Ollama's chat API.
+
+        The request holds one LLM executor slot for as long as it streams. Closing
+        the iterator (for example when the client disconnects) closes the HTTP
+        stream, which makes Ollama stop generating.
+        """
+        loop = asyncio.get_running_loop()
+        timeout = Config.LLM_REQUEST_TIMEOUT if timeout is None else timeout
+        deadline = loop.time() + timeout
+        async with self.executor.slot(timeout):
+            stream = await self.async_client.chat(
+                model=self.model,
+                messages=self.chat_messages(system_prompt, user_prompt),
+                options=self.ollama_options(),
+                keep_alive=Config.OLLAMA_KEEP_ALIVE,
+                stream=True
             )
-
+            try:
+                while True:
+                    try:
+                        part = await asyncio.wait_for(stream.__anext__(), timeout=max(deadline - loop.time(), 0))
+                    except StopAsyncIteration:
+                        break
+                    except asyncio.TimeoutError:
+                        logger.warning(f"Streaming LLM request exceeded its {timeout:.1f}s deadline")
+                        raise LLMDeadlineExceededError(f"LLM request exceeded its {timeout:.1f}s deadline")
+                    content = part['message']['content']
+                    if content:
+                        yield content
+            finally:
+                await stream.aclose()
+
+    async def analyze_with_crew(self, system_prompt: str, user_prompt: str, timeout: Optional[float] = None) -> dict:
+        def build_crew(agents: Dict[str, Agent]) -> Crew:
             analysis_task = Task(
                 description=f"{system_prompt}\n\nUser Query: {user_prompt}",
-                agent=analyst,
+                agent=agents['analyst'],
                 expected_output="A comprehensive analysis and answer to the user's query based on the given context."
             )
-
-            crew = Crew(
-                agents=[analyst],
+            return Crew(
+                agents=[agents['analyst']],
                 tasks=[analysis_task],
                 verbose=Config.CREW_VERBOSE
             )
 
+        try:
             logger.info("Starting CrewAI analysis process")
-            result = crew.kickoff()
+            result = await self.executor.run(self._kickoff, build_crew, timeout=timeout)
             logger.info("CrewAI analysis process completed")
             
             if hasattr(result, 'result'):
@@ -71,57 +215,22 @@ class CrewAIService:
                 return {"result": result.task_output}
             else:
                 return {"result": str(result)}
+        except (LLMQueueFullError, LLMDeadlineExceededError):
+            raise
         except Exception as e:
             logger.exception(f"Error in CrewAI analysis process: {str(e)}")
             raise RuntimeError(f"Error in CrewAI analysis process: {str(e)}")
 
-    async def create_agents(self) -> Tuple[Agent, Agent, Agent]:
-        try:
-            llm = self.create_ollama_llm()
-            researcher = Agent(
-                role='Researcher',
-                goal='Thoroughly analyze research papers and extract key information',
-                backstory='You are an expert researcher with years of experience in analyzing academic papers across various fields.',
-                allow_delegation=False,
-                llm=llm,
-                model_name=self.model
-            )
-            
-            writer = Agent(
-                role='Technical Writer',
-                goal='Create clear and concise summaries of research papers',
-                backstory='You are a skilled technical writer specializing in transforming complex academic content into accessible summaries.',
-                allow_delegation=False,
-                llm=llm,
-                model_name=self.model
-            )
-            
-            editor = Agent(
-                role='Editor',
-                goal='Ensure the summary is accurate, well-structured, and tailored to the specified expertise level',
-                backstory='You are an experienced editor with a keen eye for detail and a talent for adapting content to different audience levels.',
-                allow_delegation=False,
-                llm=llm,
-                model_name=self.model
-            )
-            
-            return researcher, writer, editor
-        except Exception as e:
-            logger.exception("Error creating agents")
-            raise RuntimeError(f"Error creating agents: {str(e)}")
-
+    async def summarize_with_crew(self, text: Any, level: str, timeout: Optional[float] = None) -> Any:
+        # Convert text to string if it's not already
+        if not isinstance(text, str):
+            text = str(text)
+        
+        # Truncate text safely
+        truncated_text = text[:1000] if len(text) > 1000 else text
 
-    async def summarize_with_crew(self, text: Any, level: str) -> Any:
-        try:
-            researcher, writer, editor = await self.create_agents()
-            
-            # Convert text to string if it's not already
-            if not isinstance(text, str):
-                text = str(text)
-            
-            # Truncate text safely
-            truncated_text = text[:1000] if len(text) > 1000 else text
-            
+        def build_crew(agents: Dict[str, Agent]) -> Crew:
+            researcher, writer, editor = agents['researcher'], agents['writer'], agents['editor']
             research_task = Task(
                 description=f"Analyze the following research paper and identify the key points, methodology, and findings:\n\n{truncated_text}...",
                 agent=researcher,
@@ -140,14 +249,15 @@ class CrewAIService:
                 expected_output=f"A polished, accurate, and well-structured summary appropriate for the {level} expertise level."
             )
 
-            crew = Crew(
+            return Crew(
                 agents=[researcher, writer, editor],
                 tasks=[research_task, writing_task, editing_task],
                 verbose=Config.CREW_VERBOSE
             )
 
+        try:
             logger.info(f"Starting CrewAI summarization process for level: {level}")
-            result = crew.kickoff()
+            result = await self.executor.run(self._kickoff, build_crew, timeout=timeout)
             logger.info("CrewAI summarization process completed")
             
             # Extract the summary from the CrewOutput object
@@ -157,30 +267,18 @@ class CrewAIService:
                 return str(result.task_output)
             else:
                 return str(result)
+        except (LLMQueueFullError, LLMDeadlineExceededError):
+            raise
         except Exception as e:
             logger.exception(f"Error in CrewAI summarization process: {str(e)}")
             raise RuntimeError(f"Error in CrewAI summarization process: {str(e)}")
         
-    async def summarize_profile_with_crew(self, author_info: dict, level: str) -> str:
+    async def summarize_profile_with_crew(self, author_info: dict, level: str, timeout: Optional[float] = None) -> str:
         try:
-            llm = self.create_ollama_llm()
-            
-            profile_analyst = Agent(
-                role='Academic Profile Analyst',
-                goal='Provide a comprehensive and insightful analysis of academic researcher profiles',
-                backstory="""You are a distinguished expert in analyzing academic profiles and research outputs. 
-                With years of experience in bibliometrics and scientometrics, you excel at identifying key trends, 
-                assessing research impact, and providing nuanced insights into a researcher's career trajectory.""",
-                allow_delegation=False,
-                llm=llm,
-                model_name=self.model
-            )
-
             recent_papers = self._format_paper_list(author_info.get('recent_papers', []))
             top_cited_papers = self._format_paper_list(author_info.get('top_cited', []))
 
-            profile_summary_task = Task(
-                description=f"""
+            description = f"""
                 Conduct a thorough analysis of the following academic profile and provide a detailed, insightful summary:
 
                 Author: {author_info['name']}
@@ -235,18 +333,21 @@ class CrewAIService:
 
                 Synthesize all this information into a coherent, well-structured narrative that gives a comprehensive 
                 view of the researcher's profile, achievements, and potential future impact in their field.
-                """,
-                agent=profile_analyst ,
-                expected_output="A comprehensive, well-structured analysis of the researcher's profile, including their main research areas, key contributions, impact, research evolution, collaborations, future directions, academic standing, and methodological approaches, tailored to the specified expertise level."
-            )
-
-            crew = Crew(
-                agents=[profile_analyst],
-                tasks=[profile_summary_task],
-                verbose=Config.CREW_VERBOSE
-            )
-
-            result = crew.kickoff()
+                """
+
+            def build_crew(agents: Dict[str, Agent]) -> Crew:
+                profile_summary_task = Task(
+                    description=description,
+                    agent=agents['profile_analyst'],
+                    expected_output="A comprehensive, well-structured analysis of the researcher's profile, including their main research areas, key contributions, impact, research evolution, collaborations, future directions, academic standing, and methodological approaches, tailored to the specified expertise level."
+                )
+                return Crew(
+                    agents=[agents['profile_analyst']],
+                    tasks=[profile_summary_task],
+                    verbose=Config.CREW_VERBOSE
+                )
+
+            result = await self.executor.run(self._kickoff, build_crew, timeout=timeout)
             
             if isinstance(result, str):
                 return result
@@ -255,12 +356,18 @@ class CrewAIService:
             else:
                 return str(result)
 
+        except (LLMQueueFullError, LLMDeadlineExceededError):
+            raise
         except Exception as e:
             logger.exception(f"Error in CrewAI profile summarization: {str(e)}")
             raise RuntimeError(f"Error in CrewAI profile summarization: {str(e)}")
 
 
 
+    def get_metrics(self) -> Dict[str, Any]:
+        """Return current LLM pool metrics."""
+        return {**self.executor.get_metrics(), "idle_agent_sets": self.agent_pool.qsize()}
+
     def _format_paper_list(self, papers: List[Dict]) -> str:
         formatted_papers = []
         for paper in papers[:5]:  # Limit to top 5 papers for brevity
@@ -0,0 +1,191 @@
+import asyncio
+import hashlib
+import logging
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+import aiohttp
+import numpy as np
+from cachetools import LRUCache
+from src.config import Config
+from src.services.embedding_store import EmbeddingStore
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingService:
+    """Micro-batching front end for the configured embedding model.
+
+    Texts requested by concurrent callers are collected for up to
+    ``EMBEDDING_BATCH_WINDOW_MS`` (or until ``EMBEDDING_BATCH_SIZE`` texts are
+    pending) and embedded in a single call. Identical texts share one pending
+    request and finished vectors are kept as float32 arrays in an LRU keyed by
+    the normalized text hash, backed by an optional persistent
+    ``EmbeddingStore`` so texts that were embedded before a restart or
+    re-upload are never embedded again.
+    Ollama is called directly over one pooled keep-alive session; any other
+    provider runs its Chroma embedding function in a worker thread.
+    """
+
+    def __init__(self, embedding_function: Any, model: str, provider: str = Config.EMBEDDING_PROVIDER,
+                 store: Optional[EmbeddingStore] = None):
+        self.embedding_function = embedding_function
+        self.model = model
+        self.provider = provider
+        self.store = store
+        self.batch_size = Config.EMBEDDING_BATCH_SIZE
+        self.batch_window = Config.EMBEDDING_BATCH_WINDOW_MS / 1000
+        self.cache = LRUCache(maxsize=Config.EMBEDDING_CACHE_SIZE)
+        self.session: Optional[aiohttp.ClientSession] = None
+        self.semaphore = asyncio.Semaphore(Config.EMBEDDING_MAX_CONCURRENCY)
+        self.pending: List[Tuple[str, str, asyncio.Future]] = []
+        self.in_flight: Dict[str, asyncio.Future] = {}
+        self.flush_handle: Optional[asyncio.TimerHandle] = None
+        self.tasks: Set[asyncio.Task] = set()
+        self.cache_hits = 0
+        self.store_hits = 0
+        self.cache_misses = 0
+        self.batch_count = 0
+        self.embedded_count = 0
+
+    async def initialize(self):
+        if self.store is not None and self.store.conn is None:
+            await self.store.initialize()
+        if self.provider == 'ollama' and self.session is None:
+            self.session = aiohttp.ClientSession(
+                base_url=Config.OLLAMA_BASE_URL,
+                connector=aiohttp.TCPConnector(limit=Config.EMBEDDING_MAX_CONNECTIONS, keepalive_timeout=60),
+                timeout=aiohttp.ClientTimeout(total=Config.EMBEDDING_REQUEST_TIMEOUT)
+            )
+        logger.info(f"Embedding service ready for model {self.model} ({self.provider})")
+
+    async def cleanup(self):
+        # Batches still running persist their vectors after resolving their callers, so they
+        # are let finish (bounded by the request timeout) before the store is closed
+        self._flush()
+        if self.tasks:
+            _, unfinished = await asyncio.wait(list(self.tasks), timeout=Config.EMBEDDING_REQUEST_TIMEOUT)
+            for task in unfinished:
+                task.cancel()
+            await asyncio.gather(*unfinished, return_exceptions=True)
+        if self.session:
+            await self.session.close()
+            self.session = None
+        if self.store is not None:
+            await self.store.cleanup()
+        self.cache.clear()
+
+    @staticmethod
+    def text_key(text: str) -> str:
+        # Whitespace-only differences (re-extraction, re-wrapping) map to the same vector
+        return hashlib.sha256(' '.join(text.split()).encode('utf-8')).hexdigest()
+
+    async def embed_query(self, text: str) -> List[float]:
+        return (await self.embed([text]))[0]
+
+    async def embed(self, texts: Sequence[str]) -> List[List[float]]:
+        """Returns one vector per text, batching misses with other concurrent callers."""
+        loop = asyncio.get_running_loop()
+        vectors: List[Optional[List[float]]] = [None] * len(texts)
+        waiting: List[Tuple[int, asyncio.Future]] = []
+        misses: List[Tuple[int, str, str]] = []
+
+        for i, text in enumerate(texts):
+            key = self.text_key(text)
+            cached = self.cache.get(key)
+            if cached is not None:
+                self.cache_hits += 1
+                vectors[i] = cached.tolist()
+            else:
+                misses.append((i, key, text))
+
+        if misses and self.store is not None:
+            stored = await self.store.get_many([key for _, key, _ in misses])
+            for i, key, _ in misses:
+                if key in stored:
+                    self.store_hits += 1
+                    self.cache[key] = stored[key]
+                    vectors[i] = stored[key].tolist()
+            misses = [(i, key, text) for i, key, text in misses if vectors[i] is None]
+
+        for i, key, text in misses:
+            self.cache_misses += 1
+            future = self.in_flight.get(key)
+            if future is None:
+                future = loop.create_future()
+                self.in_flight[key] = future
+                self.pending.append((key, text, future))
+            waiting.append((i, future))
+
+        if len(self.pending) >= self.batch_size:
+            self._flush()
+        elif self.pending and self.flush_handle is None:
+            self.flush_handle = loop.call_later(self.batch_window, self._flush)
+
+        for i, future in waiting:
+            # Shield the shared future so one caller going away does not fail the others
+            vectors[i] = await asyncio.shield(future)
+        return vectors
+
+    def _flush(self):
+        if self.flush_handle:
+            self.flush_handle.cancel()
+            self.flush_handle = None
+        while self.pending:
+            batch, self.pending = self.pending[:self.batch_size], self.pending[self.batch_size:]
+            task = asyncio.get_running_loop().create_task(self._run_batch(batch))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+
+    async def _run_batch(self, batch: List[Tuple[str, str, asyncio.Future]]):
+        try:
+            async with self.semaphore:
+                vectors = await self._embed_batch([text for _, text, _ in batch])
+            self.batch_count += 1
+            self.embedded_count += len(batch)
+            for (key, _, future), vector in zip(batch, vectors):
+                self.cache[key] = np.asarray(vector, dtype=np.float32)
+                if not future.done():
+                    future.set_result(vector)
+            if self.store is not None:
+                try:
+                    await self.store.put_many([(key, vector) for (key, _, _), vector in zip(batch, vectors)])
+                except Exception as e:
+                    logger.error(f"Error persisting {len(batch)} embeddings: {str(e)}")
+        except asyncio.CancelledError:
+            for _, _, future in batch:
+                future.cancel()
+            raise
+        except Exception as e:
+            logger.error(f"Error embedding batch of {len(batch)} texts: {str(e)}")
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            for key, _, _ in batch:
+                self.in_flight.pop(key, None)
+
+    async def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        if self.provider == 'ollama':
+            if self.session is None:
+                await self.initialize()
+            async with self.session.post('/api/embed', json={"model": self.model, "input": texts}) as response:
+                response.raise_for_status()
+                payload = await response.json()
+            return payload["embeddings"]
+        embeddings = await asyncio.to_thread(self.embedding_function, texts)
+        return [vector.tolist() if hasattr(vector, 'tolist') else list(vector) for vector in embeddings]
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Return current batching and cache metrics."""
+        lookups = self.cache_hits + self.store_hits + self.cache_misses
+        return {
+            "model": self.model,
+            "batches": self.batch_count,
+            "embedded_texts": self.embedded_count,
+            "average_batch_size": self.embedded_count / self.batch_count if self.batch_count > 0 else 0,
+            "cache_hits": self.cache_hits,
+            "store_hits": self.store_hits,
+            "cache_misses": self.cache_misses,
+            "cache_hit_rate": (self.cache_hits + self.store_hits) / lookups if lookups > 0 else 0,
+            "cache_size": len(self.cache),
+            "store_size": len(self.store) if self.store is not None else None,
+        }
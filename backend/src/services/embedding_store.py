@@ -0,0 +1,158 @@
+import asyncio
+import logging
+import os
+import re
+import sqlite3
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingStore:
+    """Persistent, memory-mapped embedding cache for one embedding model.
+
+    Vectors are stored as rows of a float32 matrix in ``<model>.f32`` and an
+    SQLite side table maps each normalized text hash to its row. The matrix
+    grows by doubling; new rows are flushed to disk before their index entries
+    are committed, so a crash can leave unused rows but never a dangling index.
+    """
+
+    INITIAL_CAPACITY = 1024
+
+    def __init__(self, directory: str, model: str):
+        slug = re.sub(r'[^a-zA-Z0-9_-]+', '_', model)
+        self.model = model
+        self.matrix_path = os.path.join(directory, f'{slug}.f32')
+        self.db_path = os.path.join(directory, f'{slug}.sqlite3')
+        self.conn: Optional[sqlite3.Connection] = None
+        self.lock = threading.Lock()
+        self.rows: Dict[str, int] = {}
+        self.row_count = 0
+        self.dimension: Optional[int] = None
+        self.matrix: Optional[np.memmap] = None
+
+    async def initialize(self):
+        await asyncio.to_thread(self._open)
+        logger.info(f"Embedding store for {self.model} loaded with {len(self.rows)} vectors")
+
+    def _open(self):
+        os.makedirs(os.path.dirname(self.db_path) or '.', exist_ok=True)
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        with self.lock, self.conn:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            self.conn.execute(
+                """CREATE TABLE IF NOT EXISTS embeddings (
+                    text_hash TEXT PRIMARY KEY,
+                    row INTEGER NOT NULL
+                )"""
+            )
+            meta = dict(self.conn.execute("SELECT key, value FROM meta").fetchall())
+            if 'dimension' in meta and os.path.exists(self.matrix_path):
+                self.rows = dict(self.conn.execute("SELECT text_hash, row FROM embeddings").fetchall())
+            else:
+                # Without the matrix (or its dimension) the index points at nothing; drop it
+                # on disk too, or the next write would append after rows that no longer exist
+                self.conn.execute("DELETE FROM embeddings")
+                self.conn.execute("DELETE FROM meta")
+                meta = {}
+                self.rows = {}
+        self.row_count = max(self.rows.values()) + 1 if self.rows else 0
+        if 'dimension' in meta:
+            self.dimension = int(meta['dimension'])
+            self._map()
+
+    def _map(self, capacity: Optional[int] = None):
+        """(Re)maps the matrix file, growing it to ``capacity`` rows if needed."""
+        if self.matrix is not None:
+            self.matrix.flush()
+            self.matrix = None
+        row_bytes = self.dimension * 4
+        size = os.path.getsize(self.matrix_path) if os.path.exists(self.matrix_path) else 0
+        if capacity is not None and capacity * row_bytes > size:
+            with open(self.matrix_path, 'ab') as f:
+                f.truncate(capacity * row_bytes)
+            size = capacity * row_bytes
+        if size:
+            self.matrix = np.memmap(self.matrix_path, dtype=np.float32, mode='r+', shape=(size // row_bytes, self.dimension))
+
+    async def cleanup(self):
+        with self.lock:
+            if self.matrix is not None:
+                self.matrix.flush()
+                self.matrix = None
+            if self.conn is not None:
+                self.conn.close()
+                self.conn = None
+        self.rows = {}
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def _get_many(self, keys: Sequence[str]) -> Dict[str, np.ndarray]:
+        with self.lock:
+            found = [(key, self.rows[key]) for key in keys if key in self.rows]
+            if not found or self.matrix is None:
+                return {}
+            # Fancy indexing copies the rows, so they stay valid after the matrix is remapped
+            vectors = np.asarray(self.matrix[[row for _, row in found]])
+        return {key: vector for (key, _), vector in zip(found, vectors)}
+
+    async def get_many(self, keys: Sequence[str]) -> Dict[str, np.ndarray]:
+        """Returns the stored float32 vectors for whichever of ``keys`` are present."""
+        if self.conn is None or not any(key in self.rows for key in keys):
+            return {}
+        return await asyncio.to_thread(self._get_many, keys)
+
+    def _put_many(self, items: List[Tuple[str, List[float]]]):
+        with self.lock:
+            items = [(key, vector) for key, vector in dict(items).items() if key not in self.rows]
+            if not items:
+                return
+            if self.dimension is None:
+                self.dimension = len(items[0][1])
+                with self.conn:
+                    self.conn.execute("INSERT OR REPLACE INTO meta VALUES ('dimension', ?)", (str(self.dimension),))
+                    self.conn.execute("INSERT OR REPLACE INTO meta VALUES ('model', ?)", (self.model,))
+            vectors = np.asarray([vector for _, vector in items], dtype=np.float32)
+            if vectors.ndim != 2 or vectors.shape[1] != self.dimension:
+                raise ValueError(f"Expected {self.dimension}-dimensional embeddings for {self.model}, got {vectors.shape}")
+
+            start = self.row_count
+            end = start + len(items)
+            capacity = self.matrix.shape[0] if self.matrix is not None else 0
+            if end > capacity:
+                while capacity < end:
+                    capacity = max(capacity * 2, self.INITIAL_CAPACITY)
+                self._map(capacity)
+            self.matrix[start:end] = vectors
+            self.matrix.flush()
+
+            entries = [(key, start + i) for i, (key, _) in enumerate(items)]
+            with self.conn:
+                self.conn.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?)", entries)
+            self.rows.update(entries)
+            self.row_count = end
+
+    async def put_many(self, items: List[Tuple[str, List[float]]]):
+        """Appends (text_hash, vector) pairs that are not stored yet."""
+        if self.conn is not None and items:
+            await asyncio.to_thread(self._put_many, items)
+
+    def _clear(self):
+        with self.lock:
+            self.matrix = None
+            with self.conn:
+                self.conn.execute("DELETE FROM embeddings")
+                self.conn.execute("DELETE FROM meta")
+            if os.path.exists(self.matrix_path):
+                os.remove(self.matrix_path)
+            self.rows = {}
+            self.row_count = 0
+            self.dimension = None
+
+    async def clear(self):
+        if self.conn is not None:
+            await asyncio.to_thread(self._clear)
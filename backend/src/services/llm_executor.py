@@ -0,0 +1,180 @@
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from functools import partial
+from typing import Any, AsyncIterator, Callable, Dict, Optional
+from src.config import Config
+
+logger = logging.getLogger(__name__)
+
+# Set by background workers (summary precomputation); their calls use the background lane
+background_work: ContextVar[bool] = ContextVar('background_work', default=False)
+
+
+class LLMQueueFullError(RuntimeError):
+    """Raised when the LLM wait queue is full and a request is rejected."""
+
+    def __init__(self, queue_depth: int, retry_after: int = Config.LLM_RETRY_AFTER):
+        super().__init__(f"LLM queue is full ({queue_depth} requests waiting)")
+        self.queue_depth = queue_depth
+        self.retry_after = retry_after
+
+
+class LLMDeadlineExceededError(TimeoutError):
+    """Raised when an LLM request does not finish before its deadline."""
+
+
+class LLMExecutor:
+    """Runs blocking LLM calls on a dedicated, bounded worker pool.
+
+    At most ``max_workers`` calls run at once; up to ``max_queue_size`` more wait
+    for a free worker and anything beyond that is rejected immediately. A request
+    that reaches its deadline while still queued never starts. A request that is
+    already running cannot be interrupted, so its worker stays reserved until the
+    call returns, which keeps the concurrency limit honest. Native async calls
+    such as streaming responses share the same limit through ``slot()``.
+
+    Calls made while ``background_work`` is set first wait for one of
+    ``max_background_workers`` background slots, outside the queue, so
+    background jobs can neither fill the queue nor take every worker.
+    """
+
+    def __init__(self, max_workers: int = Config.LLM_MAX_WORKERS,
+                 max_queue_size: int = Config.LLM_MAX_QUEUE_SIZE,
+                 default_timeout: float = Config.LLM_REQUEST_TIMEOUT,
+                 max_background_workers: int = Config.LLM_BACKGROUND_WORKERS):
+        self.max_workers = max_workers
+        self.max_background_workers = max_background_workers
+        self.max_queue_size = max_queue_size
+        self.default_timeout = default_timeout
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="llm-worker")
+        self._slots = asyncio.Semaphore(max_workers)
+        self._background_slots = asyncio.Semaphore(max_background_workers)
+        self.queue_depth = 0
+        self.running = 0
+        self.background_running = 0
+        self.max_queue_depth_seen = 0
+        self.submitted_count = 0
+        self.completed_count = 0
+        self.rejected_count = 0
+        self.timeout_count = 0
+
+    def check_capacity(self):
+        """Raises ``LLMQueueFullError`` if a request submitted now would be rejected.
+
+        Takes no slot, so callers that do other work first (such as retrieval
+        before a streamed answer) can fail fast without holding a worker.
+        """
+        if self._slots.locked() and self.queue_depth >= self.max_queue_size:
+            self.rejected_count += 1
+            logger.warning(f"Rejecting LLM request, queue is full ({self.queue_depth} waiting)")
+            raise LLMQueueFullError(self.queue_depth)
+
+    async def _acquire_slot(self, timeout: float) -> bool:
+        """Takes a worker slot; returns whether it was taken for background work."""
+        background = background_work.get()
+        if not background:
+            await self._acquire_worker(timeout)
+            return False
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        try:
+            await asyncio.wait_for(self._background_slots.acquire(), timeout=timeout)
+        except asyncio.TimeoutError:
+            self.timeout_count += 1
+            logger.warning(f"Background LLM request expired after {timeout:.1f}s waiting for a background slot")
+            raise LLMDeadlineExceededError(f"LLM request expired after {timeout:.1f}s in the queue")
+        try:
+            await self._acquire_worker(max(deadline - loop.time(), 0))
+        except BaseException:
+            self._background_slots.release()
+            raise
+        self.background_running += 1
+        return True
+
+    async def _acquire_worker(self, timeout: float):
+        if not self._slots.locked():
+            await self._slots.acquire()
+        else:
+            self.check_capacity()
+            self.queue_depth += 1
+            self.max_queue_depth_seen = max(self.max_queue_depth_seen, self.queue_depth)
+            try:
+                await asyncio.wait_for(self._slots.acquire(), timeout=timeout)
+            except asyncio.TimeoutError:
+                self.timeout_count += 1
+                logger.warning(f"LLM request expired after {timeout:.1f}s in the queue")
+                raise LLMDeadlineExceededError(f"LLM request expired after {timeout:.1f}s in the queue")
+            finally:
+                self.queue_depth -= 1
+        self.submitted_count += 1
+        self.running += 1
+
+    async def run(self, func: Callable[..., Any], *args, timeout: Optional[float] = None, **kwargs) -> Any:
+        """Runs ``func`` on the LLM pool, waiting at most ``timeout`` seconds in total."""
+        loop = asyncio.get_running_loop()
+        timeout = self.default_timeout if timeout is None else timeout
+        deadline = loop.time() + timeout
+
+        background = await self._acquire_slot(timeout)
+        try:
+            future = loop.run_in_executor(self.executor, partial(func, *args, **kwargs))
+        except Exception:
+            self._release_slot(background)
+            raise
+        future.add_done_callback(lambda _: self._release_slot(background))
+
+        try:
+            # Shield the worker future so a deadline or client disconnect only
+            # abandons the result; the slot is freed when the worker returns.
+            result = await asyncio.wait_for(asyncio.shield(future), timeout=max(deadline - loop.time(), 0))
+        except asyncio.TimeoutError:
+            self.timeout_count += 1
+            logger.warning(f"LLM request exceeded its {timeout:.1f}s deadline")
+            raise LLMDeadlineExceededError(f"LLM request exceeded its {timeout:.1f}s deadline")
+        self.completed_count += 1
+        return result
+
+    @asynccontextmanager
+    async def slot(self, timeout: Optional[float] = None) -> AsyncIterator[None]:
+        """Holds one worker slot for an async call that does not need a pool thread.
+
+        Queueing and rejection work as in ``run``; ``timeout`` only bounds the wait
+        for a slot, the caller enforces its own deadline once it is running.
+        """
+        background = await self._acquire_slot(self.default_timeout if timeout is None else timeout)
+        try:
+            yield
+            self.completed_count += 1
+        finally:
+            self._release_slot(background)
+
+    def _release_slot(self, background: bool = False):
+        self.running -= 1
+        self._slots.release()
+        if background:
+            self.background_running -= 1
+            self._background_slots.release()
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Return current pool and queue metrics."""
+        return {
+            "max_workers": self.max_workers,
+            "max_background_workers": self.max_background_workers,
+            "max_queue_size": self.max_queue_size,
+            "running": self.running,
+            "background_running": self.background_running,
+            "queue_depth": self.queue_depth,
+            "max_queue_depth_seen": self.max_queue_depth_seen,
+            "submitted": self.submitted_count,
+            "completed": self.completed_count,
+            "rejected": self.rejected_count,
+            "timed_out": self.timeout_count,
+        }
+
+    async def cleanup(self):
+        logger.info("Shutting down LLM executor...")
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        logger.info("LLM executor shut down")
@@ -0,0 +1,336 @@
+import asyncio
+import gzip
+import json
+import logging
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+from src.config import Config
+from src.services.arxiv_client import ArxivPaper
+
+logger = logging.getLogger(__name__)
+
+PAPER_COLUMNS = ["arxiv_id", "title", "summary", "authors", "categories", "primary_category", "published", "updated", "doi"]
+
+
+def normalize_date(value: Optional[str]) -> Optional[str]:
+    """Reduces a date or ISO datetime to ``YYYY-MM-DD``.
+
+    Dump records carry ``update_date`` as a plain date while the live feed
+    reports ``updated`` as a full timestamp, so only the dates are comparable.
+    """
+    return value[:10] if value else None
+
+
+def parse_dump_record(record: Dict[str, Any]) -> ArxivPaper:
+    """Converts one line of the arXiv OAI metadata snapshot (JSON lines) into a paper record."""
+    arxiv_id = record['id']
+    if record.get('authors_parsed'):
+        authors = [' '.join(part for part in (first, last, *suffix) if part)
+                   for last, first, *suffix in record['authors_parsed']]
+    else:
+        authors = [name for name in re.split(r',\s*|\s+and\s+', record.get('authors') or '') if name]
+    categories = (record.get('categories') or '').split()
+    published = None
+    if record.get('versions'):
+        try:
+            published = parsedate_to_datetime(record['versions'][0]['created']).strftime('%Y-%m-%dT%H:%M:%SZ')
+        except (KeyError, TypeError, ValueError):
+            pass
+    return {
+        "arxiv_id": arxiv_id,
+        "title": ' '.join((record.get('title') or '').split()),
+        "summary": ' '.join((record.get('abstract') or '').split()),
+        "authors": authors,
+        "categories": categories,
+        "primary_category": categories[0] if categories else None,
+        "published": published,
+        "updated": record.get('update_date'),
+        "abs_url": f"https://arxiv.org/abs/{arxiv_id}",
+        "pdf_url": f"https://arxiv.org/pdf/{arxiv_id}",
+        "doi": record.get('doi'),
+    }
+
+
+def read_dump(path: str) -> Iterator[ArxivPaper]:
+    """Streams paper records from a (optionally gzipped) arXiv metadata snapshot."""
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rt', encoding='utf-8') as dump:
+        for line in dump:
+            if line.strip():
+                yield parse_dump_record(json.loads(line))
+
+
+class PaperCatalog:
+    """Local catalog of arXiv metadata with a full-text index for offline search.
+
+    Papers live in an SQLite table keyed by arXiv id, with two FTS5 indexes
+    kept in sync by triggers: one over titles and authors and one over
+    abstracts. Imports are upserts that only replace a paper when the incoming
+    record is newer, so a fresh metadata dump or live API results can be
+    applied incrementally. Live results alone only cover past queries, so the
+    catalog is meant to answer searches by itself (``has_dump``) only once a
+    metadata dump has been imported with ``main``, which usually runs in another
+    process while the server is up, so ``dump_available`` looks it up again
+    until it finds one.
+
+    Title and author matches are ranked by bm25, but only the newest
+    ``max_candidates`` of them, since bm25 scores every match before it can
+    sort. Abstract-only matches are appended newest first without ranking:
+    common words occur in most abstracts, and even computing their bm25 term
+    weights reads every match.
+    """
+
+    def __init__(self, db_path: str = Config.PAPER_CATALOG_DB_PATH, max_candidates: int = Config.PAPER_CATALOG_MAX_CANDIDATES):
+        self.db_path = db_path
+        self.max_candidates = max_candidates
+        self.conn: Optional[sqlite3.Connection] = None
+        self.lock = threading.Lock()
+        self.has_dump = False
+
+    async def initialize(self):
+        logger.info(f"Opening paper catalog at {self.db_path}")
+        await asyncio.to_thread(self.open)
+
+    def open(self):
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        with self.lock, self.conn:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            self.conn.execute(
+                """CREATE TABLE IF NOT EXISTS papers (
+                    id INTEGER PRIMARY KEY,
+                    arxiv_id TEXT NOT NULL UNIQUE,
+                    title TEXT NOT NULL,
+                    summary TEXT NOT NULL,
+                    authors TEXT NOT NULL,
+                    categories TEXT NOT NULL,
+                    primary_category TEXT,
+                    published TEXT,
+                    updated TEXT,
+                    doi TEXT
+                )"""
+            )
+            self.conn.execute(
+                """CREATE VIRTUAL TABLE IF NOT EXISTS papers_fts USING fts5(
+                    title, authors, content='papers', content_rowid='id', tokenize='porter unicode61'
+                )"""
+            )
+            self.conn.execute(
+                """CREATE VIRTUAL TABLE IF NOT EXISTS abstracts_fts USING fts5(
+                    summary, content='papers', content_rowid='id', tokenize='porter unicode61'
+                )"""
+            )
+            # A title word counts for more than an author name
+            self.conn.execute("INSERT INTO papers_fts (papers_fts, rank) VALUES ('rank', 'bm25(2.0, 1.0)')")
+            self._create_triggers()
+            self.conn.execute("CREATE TABLE IF NOT EXISTS catalog_meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self.has_dump = self._read_has_dump()
+
+    def _read_has_dump(self) -> bool:
+        with self.lock:
+            return self.conn.execute(
+                "SELECT 1 FROM catalog_meta WHERE key = 'dump_imported_at'"
+            ).fetchone() is not None
+
+    async def dump_available(self) -> bool:
+        """Whether a metadata dump has been imported, including by another process since startup."""
+        if not self.has_dump and self.conn is not None:
+            self.has_dump = await asyncio.to_thread(self._read_has_dump)
+        return self.has_dump
+
+    def _create_triggers(self):
+        self.conn.execute(
+            """CREATE TRIGGER IF NOT EXISTS papers_ai AFTER INSERT ON papers BEGIN
+                INSERT INTO papers_fts (rowid, title, authors) VALUES (new.id, new.title, new.authors);
+                INSERT INTO abstracts_fts (rowid, summary) VALUES (new.id, new.summary);
+            END"""
+        )
+        self.conn.execute(
+            """CREATE TRIGGER IF NOT EXISTS papers_au AFTER UPDATE ON papers BEGIN
+                INSERT INTO papers_fts (papers_fts, rowid, title, authors) VALUES ('delete', old.id, old.title, old.authors);
+                INSERT INTO papers_fts (rowid, title, authors) VALUES (new.id, new.title, new.authors);
+                INSERT INTO abstracts_fts (abstracts_fts, rowid, summary) VALUES ('delete', old.id, old.summary);
+                INSERT INTO abstracts_fts (rowid, summary) VALUES (new.id, new.summary);
+            END"""
+        )
+        self.conn.execute(
+            """CREATE TRIGGER IF NOT EXISTS papers_ad AFTER DELETE ON papers BEGIN
+                INSERT INTO papers_fts (papers_fts, rowid, title, authors) VALUES ('delete', old.id, old.title, old.authors);
+                INSERT INTO abstracts_fts (abstracts_fts, rowid, summary) VALUES ('delete', old.id, old.summary);
+            END"""
+        )
+
+    async def cleanup(self):
+        if self.conn is not None:
+            with self.lock:
+                self.conn.close()
+            self.conn = None
+
+    def count(self) -> int:
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM papers").fetchone()[0]
+
+    @staticmethod
+    def _row(paper: ArxivPaper) -> tuple:
+        return (
+            paper['arxiv_id'], paper['title'], paper['summary'], ", ".join(paper['authors']),
+            " ".join(paper['categories']), paper['primary_category'], paper['published'], normalize_date(paper['updated']), paper['doi'],
+        )
+
+    def _upsert(self, rows: List[tuple]):
+        # Rows written before dates were normalized may still hold full timestamps
+        with self.lock, self.conn:
+            self.conn.executemany(
+                f"""INSERT INTO papers ({', '.join(PAPER_COLUMNS)}) VALUES ({', '.join('?' * len(PAPER_COLUMNS))})
+                    ON CONFLICT (arxiv_id) DO UPDATE SET
+                        {', '.join(f'{column} = excluded.{column}' for column in PAPER_COLUMNS[1:])}
+                    WHERE excluded.updated > substr(papers.updated, 1, 10) OR papers.updated IS NULL""",
+                rows
+            )
+
+    def import_papers(self, papers: Iterable[ArxivPaper], batch_size: int = Config.PAPER_CATALOG_IMPORT_BATCH_SIZE) -> int:
+        """Upserts papers in transactions of ``batch_size`` rows; returns how many were read."""
+        count = 0
+        rows = []
+        for paper in papers:
+            rows.append(self._row(paper))
+            if len(rows) >= batch_size:
+                self._upsert(rows)
+                count += len(rows)
+                rows = []
+        if rows:
+            self._upsert(rows)
+            count += len(rows)
+        return count
+
+    def bulk_import(self, papers: Iterable[ArxivPaper], batch_size: int = Config.PAPER_CATALOG_IMPORT_BATCH_SIZE) -> int:
+        """Imports a whole metadata dump, about twice as fast as ``import_papers``.
+
+        Rows are written with the index triggers dropped and the full-text index
+        is rebuilt once at the end, so searches miss the new papers until the
+        import finishes.
+        """
+        with self.lock, self.conn:
+            self.conn.execute("DROP TRIGGER IF EXISTS papers_ai")
+            self.conn.execute("DROP TRIGGER IF EXISTS papers_au")
+        try:
+            return self.import_papers(papers, batch_size)
+        finally:
+            with self.lock, self.conn:
+                self.conn.execute("INSERT INTO papers_fts (papers_fts) VALUES ('rebuild')")
+                self.conn.execute("INSERT INTO abstracts_fts (abstracts_fts) VALUES ('rebuild')")
+                self._create_triggers()
+
+    def mark_dump_imported(self, path: str):
+        """Records that a full metadata dump is in the catalog, which lets it serve searches alone."""
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO catalog_meta VALUES (?, ?)",
+                [('dump_imported_at', str(time.time())), ('dump_path', path)]
+            )
+        self.has_dump = True
+
+    async def add(self, papers: List[ArxivPaper]):
+        """Adds papers fetched from the live API, so the catalog grows with every search."""
+        if papers:
+            await asyncio.to_thread(self.import_papers, papers)
+
+    def optimize(self):
+        """Merges the full-text index segments, which speeds up queries after a large import."""
+        with self.lock, self.conn:
+            self.conn.execute("INSERT INTO papers_fts (papers_fts) VALUES ('optimize')")
+            self.conn.execute("INSERT INTO abstracts_fts (abstracts_fts) VALUES ('optimize')")
+
+    @staticmethod
+    def match_expression(query: str, operator: str = ' ') -> Optional[str]:
+        terms = re.findall(r'\w+', query.lower())
+        if not terms:
+            return None
+        # Quoted, so words like NOT or NEAR are not read as FTS5 operators
+        return operator.join(f'"{term}"' for term in terms)
+
+    def _search(self, query: str, limit: int) -> List[ArxivPaper]:
+        # Every term must match: papers sharing only one word with the query are not results
+        match = self.match_expression(query)
+        if match is None:
+            return []
+        with self.lock:
+            floor = self.conn.execute(
+                "SELECT rowid FROM papers_fts WHERE papers_fts MATCH ? ORDER BY rowid DESC LIMIT 1 OFFSET ?",
+                (match, self.max_candidates - 1)
+            ).fetchone()
+            ids = [row[0] for row in self.conn.execute(
+                "SELECT rowid FROM papers_fts WHERE papers_fts MATCH ? AND rowid >= ? ORDER BY rank LIMIT ?",
+                (match, floor[0] if floor else 0, limit)
+            )]
+            if len(ids) < limit:
+                # Walks the abstract index from the newest paper and stops early, however common the words
+                found = set(ids)
+                ids.extend(row[0] for row in self.conn.execute(
+                    "SELECT rowid FROM abstracts_fts WHERE abstracts_fts MATCH ? ORDER BY rowid DESC LIMIT ?",
+                    (match, limit)
+                ) if row[0] not in found)
+                ids = ids[:limit]
+        if not ids:
+            return []
+        with self.lock:
+            rows = self.conn.execute(
+                f"SELECT id, {', '.join(PAPER_COLUMNS)} FROM papers WHERE id IN ({', '.join('?' * len(ids))})", ids
+            ).fetchall()
+        by_id = {row['id']: row for row in rows}
+        return [self._paper(by_id[paper_id]) for paper_id in ids if paper_id in by_id]
+
+    @staticmethod
+    def _paper(row: sqlite3.Row) -> ArxivPaper:
+        return {
+            "arxiv_id": row['arxiv_id'],
+            "title": row['title'],
+            "summary": row['summary'],
+            "authors": row['authors'].split(", ") if row['authors'] else [],
+            "categories": row['categories'].split(),
+            "primary_category": row['primary_category'],
+            "published": row['published'],
+            "updated": row['updated'],
+            "abs_url": f"https://arxiv.org/abs/{row['arxiv_id']}",
+            "pdf_url": f"https://arxiv.org/pdf/{row['arxiv_id']}",
+            "doi": row['doi'],
+        }
+
+    async def search(self, query: str, limit: int = Config.PAPER_CATALOG_MAX_RESULTS) -> List[ArxivPaper]:
+        """Full-text search over titles, abstracts and authors, best matches first."""
+        if self.conn is None:
+            return []
+        start = time.perf_counter()
+        papers = await asyncio.to_thread(self._search, query, limit)
+        logger.info(f"Paper catalog returned {len(papers)} results in {(time.perf_counter() - start) * 1000:.1f} ms")
+        return papers
+
+
+def main(paths: List[str]):
+    logging.basicConfig(level=logging.INFO)
+    catalog = PaperCatalog()
+    catalog.open()
+    for path in paths:
+        start = time.perf_counter()
+        # An empty catalog is filled in bulk; later dumps are applied as incremental upserts
+        importer = catalog.bulk_import if catalog.count() == 0 else catalog.import_papers
+        count = importer(read_dump(path))
+        catalog.mark_dump_imported(path)
+        logger.info(f"Imported {count} records from {path} in {time.perf_counter() - start:.1f}s")
+    catalog.optimize()
+    logger.info(f"Paper catalog at {catalog.db_path} holds {catalog.count()} papers")
+
+
+if __name__ == "__main__":
+    # python -m src.services.paper_catalog arxiv-metadata-oai-snapshot.json[.gz] ...
+    main(sys.argv[1:])
@@ -1,13 +1,17 @@
 import asyncio
+import time
 import aiohttp
-from bs4 import BeautifulSoup
+from concurrent.futures import ThreadPoolExecutor
 from scholarly import scholarly
 import logging
-from typing import List, Dict, Any, Optional
+from typing import Awaitable, Callable, List, Dict, Any, Optional, Tuple
 from src.config import Config
 from src.services.rag_service import RAGService
 from src.services.crew_service import CrewAIService
 from src.services.ai_service import AIService
+from src.services.search_cache import SearchCache
+from src.services.arxiv_client import ArxivClient, ArxivPaper
+from src.services.paper_catalog import PaperCatalog
 from collections import Counter
 from nltk.corpus import stopwords
 import nltk
@@ -22,58 +26,163 @@ def setup_nltk():
 
 setup_nltk()
 STOPWORDS = set(stopwords.words('english'))
+SOURCE_TIMEOUT_GRACE = 2  # seconds past a source's own deadline before its fetch is cancelled
 
 class PaperSearchService:
     def __init__(self, rag_service: RAGService, crew_service: CrewAIService, ai_service: AIService):
         self.rag_service = rag_service
         self.crew_service = crew_service
         self.ai_service = ai_service
+        # scholarly is synchronous; its calls run here so they never block the event loop
+        self.blocking_executor: Optional[ThreadPoolExecutor] = None
+        self.arxiv_session: Optional[aiohttp.ClientSession] = None
+        self.arxiv_client: Optional[ArxivClient] = None
+        self.search_cache = SearchCache() if Config.USE_SEARCH_CACHE else None
+        self.catalog = PaperCatalog() if Config.USE_PAPER_CATALOG else None
 
     async def initialize(self):
-        global summarize_text
         logger.info("Initializing PaperSearchService...")
+        if self.search_cache and self.search_cache.conn is None:
+            await self.search_cache.initialize()
+        if self.catalog and self.catalog.conn is None:
+            await self.catalog.initialize()
+        self.blocking_executor = ThreadPoolExecutor(max_workers=Config.SEARCH_BLOCKING_WORKERS, thread_name_prefix="search-source")
+        self.arxiv_session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=Config.SEARCH_MAX_CONNECTIONS, keepalive_timeout=60),
+            timeout=aiohttp.ClientTimeout(total=Config.SEARCH_SOURCE_TIMEOUT)
+        )
+        self.arxiv_client = ArxivClient(self.arxiv_session)
         logger.info("PaperSearchService initialized successfully")
 
     async def cleanup(self):
         logger.info("Cleaning up PaperSearchService...")
-        # Add any cleanup logic if needed
+        if self.search_cache:
+            await self.search_cache.cleanup()
+        if self.catalog:
+            await self.catalog.cleanup()
+        if self.arxiv_session:
+            await self.arxiv_session.close()
+            self.arxiv_session = None
+            self.arxiv_client = None
+        if self.blocking_executor:
+            self.blocking_executor.shutdown(wait=False, cancel_futures=True)
+            self.blocking_executor = None
         logger.info("PaperSearchService cleaned up")
 
+    async def run_blocking(self, func: Callable, *args) -> Any:
+        if self.blocking_executor is None:
+            await self.initialize()
+        return await asyncio.get_running_loop().run_in_executor(self.blocking_executor, func, *args)
+
+    @staticmethod
+    def _fetch_google_scholar_sync(query: str, deadline: float) -> List[str]:
+        results = []
+        for paper in scholarly.search_pubs(query):
+            results.append(paper['bib']['title'])
+            # Each item can trigger another page request, so stop once the caller has given up
+            if len(results) >= Config.GOOGLE_SCHOLAR_MAX_RESULTS or time.monotonic() >= deadline:
+                break
+        return results
+
     async def fetch_google_scholar(self, query: str) -> List[str]:
         try:
-            results = []
-            search_query = scholarly.search_pubs(query)
-            for paper in search_query:
-                results.append(paper['bib']['title'])
-                if len(results) >= Config.GOOGLE_SCHOLAR_MAX_RESULTS:
-                    break
+            deadline = time.monotonic() + Config.SEARCH_SOURCE_TIMEOUT
+            results = await self.run_blocking(self._fetch_google_scholar_sync, query, deadline)
             logger.info(f"Fetched {len(results)} results from Google Scholar")
             return results
         except Exception as e:
             logger.error(f"Error fetching from Google Scholar: {str(e)}")
             return []
 
-    async def fetch_arxiv(self, query: str) -> List[str]:
-        base_url = "http://export.arxiv.org/api/query?"
-        search_query = f"search_query=all:{query}&start=0&max_results={Config.ARXIV_MAX_RESULTS}"
+    async def fetch_arxiv(self, query: str, max_results: Optional[int] = None) -> List[ArxivPaper]:
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(base_url + search_query) as response:
-                    soup = BeautifulSoup(await response.text(), 'xml')
-                    results = [entry.title.text for entry in soup.find_all('entry')]
+            if self.arxiv_client is None:
+                await self.initialize()
+            deadline = time.monotonic() + Config.SEARCH_SOURCE_TIMEOUT
+            results = await self.arxiv_client.search(query, max_results, deadline)
             logger.info(f"Fetched {len(results)} results from ArXiv")
             return results
         except Exception as e:
             logger.error(f"Error fetching from ArXiv: {str(e)}")
             return []
 
+    async def _fetch_with_timeout(self, name: str, fetch: Callable[[str], Awaitable[Any]], query: str) -> Any:
+        start = time.perf_counter()
+        try:
+            # Sources stop at their own SEARCH_SOURCE_TIMEOUT deadline and return what they have;
+            # this outer limit is only a backstop, so it must not cancel them first
+            results = await asyncio.wait_for(fetch(query), timeout=Config.SEARCH_SOURCE_TIMEOUT + SOURCE_TIMEOUT_GRACE)
+            logger.info(f"Source {name} answered in {time.perf_counter() - start:.2f}s")
+            return results
+        except asyncio.TimeoutError:
+            logger.warning(f"Source {name} did not stop at its {Config.SEARCH_SOURCE_TIMEOUT}s deadline, dropping its results")
+            return None
+
+    async def _fetch_source(self, name: str, fetch: Callable[[str], Awaitable[Any]], query: str) -> Tuple[Any, str]:
+        """Returns the source's results and whether they came from the cache ('hit', 'stale' or 'miss')."""
+        if not self.search_cache:
+            return await self._fetch_with_timeout(name, fetch, query), "miss"
+        return await self.search_cache.get_or_fetch(
+            name, query, lambda: self._fetch_with_timeout(name, fetch, query),
+            on_refresh=lambda results: self.store_refreshed(name, query, results)
+        )
+
+    async def store_refreshed(self, name: str, query: str, results: Any):
+        """Stores a source's results after a stale cache entry was refreshed in the background.
+
+        Does what a cache miss does with the same results, so RAG and the paper
+        catalog stay as current as the search cache.
+        """
+        if name == "google_scholar":
+            await self.store_results(query, results, [])
+        elif name == "arxiv":
+            arxiv_papers = [paper for paper in results if isinstance(paper, dict)]
+            await self.add_to_catalog(arxiv_papers)
+            await self.store_results(query, [], arxiv_papers)
+        elif name == "google_scholar_author":
+            await self.store_author(query, results)
+
+    async def fetch_all_sources(self, query: str) -> Tuple[Dict[str, List[Any]], Dict[str, str]]:
+        """Queries every source concurrently; a slow or failing source only drops its own results."""
+        sources = [
+            ("google_scholar", self.fetch_google_scholar),
+            ("arxiv", self.fetch_arxiv),
+        ]
+        results = await asyncio.gather(*(self._fetch_source(name, fetch, query) for name, fetch in sources))
+        return (
+            {name: source_results or [] for (name, _), (source_results, _) in zip(sources, results)},
+            {name: status for (name, _), (_, status) in zip(sources, results)},
+        )
+
+    @staticmethod
+    def arxiv_record(paper: ArxivPaper) -> Tuple[str, str, Dict[str, Any]]:
+        """Builds the (text, doc_id, metadata) stored in RAG for an arXiv paper, keyed by its arXiv id."""
+        text = f"{paper['title']}\n\n{paper['summary']}"
+        metadata = {
+            "source": "arxiv",
+            "title": paper['title'],
+            "arxiv_id": paper['arxiv_id'],
+            "authors": ", ".join(paper['authors']),
+            "categories": ", ".join(paper['categories']),
+            "primary_category": paper['primary_category'],
+            "published": paper['published'],
+            "pdf_url": paper['pdf_url'],
+            "doi": paper['doi'],
+        }
+        return text, f"arxiv_{paper['arxiv_id']}", metadata
+
+    def _fetch_author_sync(self, author_name: str) -> Optional[Dict[str, Any]]:
+        author = next(scholarly.search_author(author_name), None)
+        if author:
+            scholarly.fill(author)
+        return author
+
     async def fetch_author_details(self, author_name: str) -> Optional[Dict[str, Any]]:
         try:
-            author = next(scholarly.search_author(author_name), None)
+            author = await self.run_blocking(self._fetch_author_sync, author_name)
             if not author:
                 logger.warning(f"Author not found: {author_name}")
                 return None
-            scholarly.fill(author)
             
             publications = author.get('publications', [])
             top_cited = sorted(publications, key=lambda x: x.get('num_citations', 0), reverse=True)[:Config.AUTHOR_TOP_CITED_COUNT]
@@ -139,30 +248,82 @@ class PaperSearchService:
         return summary
 
     async def search_papers(self, query: str) -> List[str]:
-        scholar_results = await self.fetch_google_scholar(query)
-        arxiv_results = await self.fetch_arxiv(query)
-        all_results = scholar_results + arxiv_results
-        
-        # Store results in RAG
-        tasks = [self.rag_service.store_document(paper, f"search_result_{query}_{i}") 
-                 for i, paper in enumerate(all_results)]
-        results = await asyncio.gather(*tasks, return_exceptions=True)
-        for i, result in enumerate(results):
-            if isinstance(result, Exception):
-                logger.error(f"Error storing search result {i} in RAG: {str(result)}")
-        
-        logger.info(f"Completed paper search for query: {query}")
-        return all_results
+        results, _ = await self.search_papers_with_status(query)
+        return results
 
-    async def search_author(self, author_name: str) -> Optional[Dict[str, Any]]:
-        author_details = await self.fetch_author_details(author_name)
-        if author_details:
+    async def add_to_catalog(self, arxiv_papers: List[ArxivPaper]):
+        """Live results keep the local catalog current between metadata imports."""
+        if not self.catalog:
+            return
+        try:
+            await self.catalog.add(arxiv_papers)
+        except Exception as e:
+            logger.error(f"Error adding arXiv results to the paper catalog: {str(e)}")
+
+    async def store_results(self, query: str, titles: List[str], arxiv_papers: List[ArxivPaper]):
+        """Stores results in RAG with one deduplicated, batched write; arXiv abstracts under their stable ids."""
+        try:
+            records = [(title, f"search_result_{query}_{i}", None) for i, title in enumerate(titles)]
+            records.extend(self.arxiv_record(paper) for paper in arxiv_papers)
+            stored = await self.rag_service.bulk_store_documents(records)
+            logger.info(f"Stored {sum(is_new for _, is_new in stored)} new search results in RAG")
+        except Exception as e:
+            logger.error(f"Error storing search results in RAG: {str(e)}")
+
+    async def search_papers_with_status(self, query: str) -> Tuple[List[str], Dict[str, str]]:
+        """Searches the local catalog, then all live sources if it has too few matches.
+
+        The catalog answers alone only once a metadata dump has been imported;
+        until then it just collects live arXiv results. Reports the cache status
+        of each source, with "skipped" for live sources a catalog hit replaced.
+        """
+        use_catalog = bool(self.catalog) and await self.catalog.dump_available()
+        if use_catalog:
             try:
-                await self.rag_service.store_document(str(author_details), f"author_{author_name}")
-                logger.info(f"Stored author details in RAG for: {author_name}")
+                local_papers = await self.catalog.search(query)
             except Exception as e:
-                logger.error(f"Error storing author details in RAG: {str(e)}")
+                logger.error(f"Error searching the paper catalog: {str(e)}")
+                local_papers = []
+            if len(local_papers) >= Config.PAPER_CATALOG_MIN_RESULTS:
+                await self.store_results(query, [], local_papers)
+                return [paper['title'] for paper in local_papers], {
+                    "paper_catalog": "hit", "google_scholar": "skipped", "arxiv": "skipped"
+                }
+
+        source_results, live_status = await self.fetch_all_sources(query)
+        cache_status = {"paper_catalog": "miss", **live_status} if use_catalog else live_status
+        # Entries cached before arXiv results carried metadata are plain titles
+        arxiv_papers = [paper for paper in source_results["arxiv"] if isinstance(paper, dict)]
+        all_results = source_results["google_scholar"] + [
+            paper['title'] if isinstance(paper, dict) else paper for paper in source_results["arxiv"]
+        ]
+        if "miss" not in live_status.values():
+            # Every live source was served from the cache, so these results are already stored
+            return all_results, cache_status
+
+        if live_status["arxiv"] == "miss":
+            await self.add_to_catalog(arxiv_papers)
+        await self.store_results(query, source_results["google_scholar"], arxiv_papers)
+
+        logger.info(f"Completed paper search for query: {query}")
+        return all_results, cache_status
+
+    async def search_author(self, author_name: str) -> Optional[Dict[str, Any]]:
+        author_details, _ = await self.search_author_with_status(author_name)
         return author_details
+
+    async def search_author_with_status(self, author_name: str) -> Tuple[Optional[Dict[str, Any]], Dict[str, str]]:
+        author_details, status = await self._fetch_source("google_scholar_author", self.fetch_author_details, author_name)
+        if author_details and status == "miss":
+            await self.store_author(author_name, author_details)
+        return author_details, {"google_scholar_author": status}
+
+    async def store_author(self, author_name: str, author_details: Dict[str, Any]):
+        try:
+            await self.rag_service.bulk_store_documents([(str(author_details), f"author_{author_name}", None)])
+            logger.info(f"Stored author details in RAG for: {author_name}")
+        except Exception as e:
+            logger.error(f"Error storing author details in RAG: {str(e)}")
     
     async def analyze_search_results(self, query: str, results: List[str]) -> Optional[str]:
         analysis_prompt = f"""
@@ -175,7 +336,7 @@ class PaperSearchService:
         """
         
         try:
-            analysis = await self.crew_service.analyze_with_crew("Analyze search results", analysis_prompt)
+            analysis = await self.crew_service.analyze("Analyze search results", analysis_prompt, backend=Config.SEARCH_LLM_BACKEND)
             logger.info(f"Completed analysis of search results for query: {query}")
             return analysis
         except Exception as e:
@@ -2,11 +2,14 @@ import logging
 import os
 import fitz
 import asyncio
-import re
-import unicodedata
-from typing import Dict, Any, Optional, List, AsyncGenerator
-from concurrent.futures import ThreadPoolExecutor
+import multiprocessing
+import tempfile
+from typing import Dict, Any, Optional, List, AsyncGenerator, Union, Tuple
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
 from src.config import Config
+from src.services.pdf_text import clean_text, extract_page_range, extract_text_from_page, open_pdf
 from cachetools import TTLCache
 import threading
 
@@ -17,6 +20,7 @@ class PDFService:
         self.executor = ThreadPoolExecutor(max_workers=4)  # Adjust the number of workers as needed
         self.cache = TTLCache(maxsize=1000, ttl=3600)
         self.cache_lock = threading.Lock()
+        self.process_executor: Optional[ProcessPoolExecutor] = None
 
     async def initialize(self):
         logger.info("Initializing PDFService...")
@@ -25,17 +29,12 @@ class PDFService:
     async def cleanup(self):
         logger.info("Cleaning up PDFService...")
         self.executor.shutdown()
+        if self.process_executor:
+            self.process_executor.shutdown(cancel_futures=True)
         logger.info("PDFService cleaned up")
 
-    @staticmethod
-    def extract_text_from_page(page: fitz.Page) -> str:
-        text = page.get_text()
-        return PDFService.clean_text(text)
-
-    @staticmethod
-    def clean_text(text: str) -> str:
-        text = ''.join(ch for ch in text if unicodedata.category(ch)[0] != 'C')
-        return re.sub(r'\s+', ' ', text).strip()
+    extract_text_from_page = staticmethod(extract_text_from_page)
+    clean_text = staticmethod(clean_text)
 
     @staticmethod
     def check_pdf(file_path: str) -> bool:
@@ -53,6 +52,26 @@ class PDFService:
             text_list = [self.extract_text_from_page(doc[i]) for i in range(start_page, end)]
             return "\n".join(text_list)
 
+    def extract_pages(self, pdf_path: str) -> List[str]:
+        with fitz.open(pdf_path) as doc:
+            return [self.extract_text_from_page(page) for page in doc]
+
+    @staticmethod
+    def split_pages(pages: List[str], chunk_size: int = Config.CHUNK_SIZE, chunk_overlap: int = Config.CHUNK_OVERLAP) -> List[Document]:
+        """Splits each page into overlapping chunks tagged with their 1-based page number."""
+        splitter = RecursiveCharacterTextSplitter(
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap,
+            separators=[". ", "? ", "! ", "; ", ", ", " ", ""],
+        )
+        splits = []
+        for page_number, page_text in enumerate(pages, start=1):
+            if not page_text:
+                continue
+            for chunk in splitter.split_text(page_text):
+                splits.append(Document(page_content=chunk, metadata={"page": page_number}))
+        return splits
+
     def cached_extract_text(self, pdf_path: str, start_page: int = 0, end_page: Optional[int] = None) -> str:
         cache_key = f"{pdf_path}:{start_page}:{end_page}"
         with self.cache_lock:
@@ -112,6 +131,23 @@ class PDFService:
     
 
 
+    async def extract_pages_from_pdf(self, pdf_path: str) -> List[str]:
+        """Extracts the cleaned text of every page of a PDF file."""
+        if not os.path.exists(pdf_path):
+            logger.error(f"PDF file not found: {pdf_path}")
+            raise FileNotFoundError(f"PDF file not found: {pdf_path}")
+
+        try:
+            pages = await asyncio.get_running_loop().run_in_executor(self.executor, self.extract_pages, pdf_path)
+            logger.info(f"Successfully extracted {len(pages)} pages from PDF: {pdf_path}")
+            return pages
+        except fitz.FileDataError as e:
+            logger.error(f"Invalid or corrupted PDF file: {pdf_path}")
+            raise ValueError(f"Invalid or corrupted PDF file: {str(e)}")
+        except Exception as e:
+            logger.exception(f"Error extracting pages from PDF: {pdf_path}")
+            raise RuntimeError(f"Error extracting pages from PDF: {str(e)}")
+
     @staticmethod
     def extract_metadata(pdf_path: str) -> Dict[str, Any]:
         with fitz.open(pdf_path) as doc:
@@ -142,24 +178,115 @@ class PDFService:
             logger.exception(f"Error getting page count for PDF: {pdf_path}")
             raise RuntimeError(f"Error getting page count for PDF: {str(e)}")
 
-    async def process_pdf(self, pdf_path: str) -> Dict[str, Any]:
-        """Processes a PDF file, extracting text, metadata, and page count."""
-        try:
-            text_task = self.extract_text_from_pdf(pdf_path)
-            metadata_task = self.extract_pdf_metadata(pdf_path)
-            page_count_task = self.get_pdf_page_count(pdf_path)
+    open_pdf = staticmethod(open_pdf)
+
+    @classmethod
+    def analyze_pdf(cls, source: Union[str, bytes], include_chunks: bool = False,
+                    max_inline_pages: Optional[int] = None) -> Dict[str, Any]:
+        """Validates a PDF and extracts its metadata, page count, page texts and optional chunks in one open.
 
-            text, metadata, page_count = await asyncio.gather(text_task, metadata_task, page_count_task)
+        Documents with at least ``max_inline_pages`` pages are returned with ``pages`` set
+        to None so the caller can extract them on the process pool instead.
+        """
+        try:
+            doc = cls.open_pdf(source)
+        except Exception as e:
+            logger.error(f"Error opening PDF. Error: {str(e)}")
+            return {"valid": False, "metadata": {}, "page_count": 0, "pages": [], "chunks": []}
 
+        with doc:
+            if not doc.is_pdf or len(doc) == 0:
+                return {"valid": False, "metadata": {}, "page_count": 0, "pages": [], "chunks": []}
+            if max_inline_pages is not None and len(doc) >= max_inline_pages:
+                return {
+                    "valid": True,
+                    "metadata": dict(doc.metadata or {}),
+                    "page_count": len(doc),
+                    "pages": None,
+                    "chunks": [],
+                }
+            pages = [cls.extract_text_from_page(page) for page in doc]
             return {
-                "text": text,
-                "metadata": metadata,
-                "page_count": page_count
+                "valid": True,
+                "metadata": dict(doc.metadata or {}),
+                "page_count": len(doc),
+                "pages": pages,
+                "chunks": cls.split_pages(pages) if include_chunks else [],
             }
+
+    async def process_pdf(self, source: Union[str, bytes], include_chunks: bool = False) -> Dict[str, Any]:
+        """Processes a PDF file path or in-memory buffer, extracting text, metadata, and page count."""
+        if isinstance(source, str) and not os.path.exists(source):
+            logger.error(f"PDF file not found: {source}")
+            raise FileNotFoundError(f"PDF file not found: {source}")
+
+        name = source if isinstance(source, str) else f"<{len(source)} byte buffer>"
+        try:
+            loop = asyncio.get_running_loop()
+            max_inline_pages = Config.PDF_PARALLEL_MIN_PAGES if Config.PDF_PROCESS_WORKERS > 0 else None
+            result = await loop.run_in_executor(
+                self.executor, self.analyze_pdf, source, include_chunks, max_inline_pages
+            )
+            if result["valid"] and result["pages"] is None:
+                result["pages"] = await self.extract_pages_parallel(source, result["page_count"])
+                if include_chunks:
+                    result["chunks"] = await loop.run_in_executor(self.executor, self.split_pages, result["pages"])
+            result["text"] = "\n".join(page for page in result["pages"] if page)
+            logger.info(f"Processed PDF {name}: valid={result['valid']}, pages={result['page_count']}")
+            return result
         except Exception as e:
-            logger.exception(f"Error processing PDF: {pdf_path}")
+            logger.exception(f"Error processing PDF: {name}")
             raise RuntimeError(f"Error processing PDF: {str(e)}")
 
+    def _get_process_executor(self) -> ProcessPoolExecutor:
+        if self.process_executor is None:
+            # Spawn rather than fork: the server process already runs threads (Chroma, torch)
+            self.process_executor = ProcessPoolExecutor(
+                max_workers=Config.PDF_PROCESS_WORKERS,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return self.process_executor
+
+    async def iter_page_ranges(self, source: Union[str, bytes], page_count: int) -> AsyncGenerator[Tuple[int, List[str]], None]:
+        """Extracts page ranges on the process pool, yielding (start_page, pages) as each range finishes."""
+        loop = asyncio.get_running_loop()
+        executor = self._get_process_executor()
+        workers = max(1, min(Config.PDF_PROCESS_WORKERS, page_count))
+        range_size = -(-page_count // workers)
+        # Workers get a path, not the bytes: an in-memory PDF is written once instead of pickled per range
+        temp_path = await asyncio.to_thread(self._write_temp_pdf, source) if isinstance(source, (bytes, bytearray)) else None
+        path = temp_path or source
+        futures = [
+            loop.run_in_executor(executor, extract_page_range, path, start, min(start + range_size, page_count))
+            for start in range(0, page_count, range_size)
+        ]
+        try:
+            for future in asyncio.as_completed(futures):
+                yield await future
+        finally:
+            for future in futures:
+                future.cancel()
+            if temp_path:
+                # Ranges still running keep their open handle, so the file can go now
+                try:
+                    os.unlink(temp_path)
+                except OSError as e:
+                    logger.warning(f"Could not remove temporary PDF {temp_path}: {str(e)}")
+
+    @staticmethod
+    def _write_temp_pdf(data: bytes) -> str:
+        with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as temp_file:
+            temp_file.write(data)
+        return temp_file.name
+
+    async def extract_pages_parallel(self, source: Union[str, bytes], page_count: int) -> List[str]:
+        """Extracts all pages on the process pool and merges them in page order."""
+        pages: List[Optional[str]] = [None] * page_count
+        async for start, range_pages in self.iter_page_ranges(source, page_count):
+            pages[start:start + len(range_pages)] = range_pages
+        logger.info(f"Extracted {page_count} pages on the process pool")
+        return pages
+
     @staticmethod
     async def extract_chunks_generator(pdf_path: str, chunk_size: int = 1000) -> AsyncGenerator[str, None]:
         with fitz.open(pdf_path) as doc:
@@ -183,4 +310,5 @@ class PDFService:
             return chunks
         except Exception as e:
             logger.exception(f"Error extracting text chunks from PDF: {pdf_path}")
-            raise RuntimeError(f"Error extracting text chunks from PDF: {str(e)}")
\ No newline at end of file
+            raise RuntimeError(f"Error extracting text chunks from PDF: {str(e)}")
+
@@ -0,0 +1,56 @@
+"""Text extraction helpers shared by PDFService and its process-pool workers.
+
+Workers import only this module, so it must not pull in the rest of the app.
+"""
+import re
+import unicodedata
+from functools import lru_cache
+from typing import List, Tuple, Union
+import fitz
+from src.config import Config
+
+LIGATURE_TABLE = str.maketrans({
+    '\ufb00': 'ff', '\ufb01': 'fi', '\ufb02': 'fl', '\ufb03': 'ffi',
+    '\ufb04': 'ffl', '\ufb05': 'st', '\ufb06': 'st',
+})
+HYPHENATED_LINE_BREAK_RE = re.compile(r'(\w)-[ \t]*\r?\n\s*(\w)')
+
+
+@lru_cache(maxsize=None)
+def is_control_char(ch: str) -> bool:
+    return unicodedata.category(ch)[0] == 'C'
+
+
+def clean_text(text: str, repair_ligatures: bool = Config.PDF_REPAIR_LIGATURES,
+               repair_hyphenation: bool = Config.PDF_REPAIR_HYPHENATION) -> str:
+    """Drops control/format characters and collapses whitespace runs to single spaces.
+
+    Only the distinct characters of the text are classified, and each control
+    character found is removed in one C-level pass, instead of calling
+    ``unicodedata.category`` for every character.
+    """
+    if repair_hyphenation:
+        text = HYPHENATED_LINE_BREAK_RE.sub(r'\1\2', text)
+    if repair_ligatures:
+        text = text.translate(LIGATURE_TABLE)
+    for ch in set(text):
+        if is_control_char(ch):
+            text = text.replace(ch, '')
+    # str.split() and the regex \s use the same definition of whitespace
+    return ' '.join(text.split())
+
+
+def extract_text_from_page(page: fitz.Page) -> str:
+    return clean_text(page.get_text())
+
+
+def open_pdf(source: Union[str, bytes]) -> fitz.Document:
+    if isinstance(source, (bytes, bytearray)):
+        return fitz.open(stream=source, filetype="pdf")
+    return fitz.open(source)
+
+
+def extract_page_range(path: str, start: int, end: int) -> Tuple[int, List[str]]:
+    """Process pool worker: opens the PDF once and extracts pages ``start`` to ``end``."""
+    with open_pdf(path) as doc:
+        return start, [extract_text_from_page(doc[i]) for i in range(start, end)]
@@ -1,31 +1,76 @@
 import asyncio
 import chromadb
+from chromadb.utils.embedding_functions import DefaultEmbeddingFunction, OllamaEmbeddingFunction
 import logging
-from typing import List, Dict, Any, Optional, Tuple
+from typing import List, Dict, Any, Optional, Tuple, BinaryIO, AsyncGenerator
 from src.config import Config
+from src.services.content_index import ContentHashIndex
+from src.services.embedding_service import EmbeddingService
+from src.services.embedding_store import EmbeddingStore
+from src.services.pdf_service import PDFService
 from cachetools import TTLCache
 from functools import partial
 import hashlib
 import os
+import re
 
 logger = logging.getLogger(__name__)
 
 class RAGService:
-    def __init__(self, storage_path: str = Config.RAG_STORAGE_PATH):
+    """Owns the single Chroma client, embedding function and collections shared by all services."""
+
+    def __init__(self, storage_path: str = Config.RAG_STORAGE_PATH, embedding_provider: str = Config.EMBEDDING_PROVIDER):
         self.storage_path = storage_path
         self.client: Optional[chromadb.PersistentClient] = None
         self.collection: Optional[chromadb.Collection] = None
+        self.chunk_collection: Optional[chromadb.Collection] = None
+        self.embedding_function, self.embedding_model = self.create_embedding_function(embedding_provider)
+        self.collection_name = self.collection_name_for(Config.CHROMA_COLLECTION_NAME, embedding_provider, self.embedding_model)
+        self.chunk_collection_name = self.collection_name_for(Config.CHROMA_CHUNK_COLLECTION_NAME, embedding_provider, self.embedding_model)
+        embedding_store = EmbeddingStore(os.path.join(storage_path, 'embedding_cache'), self.embedding_model) if Config.USE_EMBEDDING_STORE else None
+        self.embedder = EmbeddingService(self.embedding_function, self.embedding_model, embedding_provider, embedding_store)
+        self.content_index = ContentHashIndex(os.path.join(storage_path, f'{self.collection_name}_content_index.sqlite3'))
         self.cache = TTLCache(maxsize= 10000,ttl=3600) 
+        self.missing_cache = TTLCache(maxsize=10000, ttl=Config.RAG_MISSING_CACHE_TTL)
+        # Serializes choosing a free document id with writing it
+        self.store_lock = asyncio.Lock()
+
+    @staticmethod
+    def create_embedding_function(provider: str) -> Tuple[Any, str]:
+        if provider == 'ollama':
+            return OllamaEmbeddingFunction(url=Config.OLLAMA_BASE_URL, model_name=Config.OLLAMA_EMBEDDING_MODEL), Config.OLLAMA_EMBEDDING_MODEL
+        if provider == 'default':
+            return DefaultEmbeddingFunction(), 'all-MiniLM-L6-v2'
+        raise ValueError(f"Unknown embedding provider: {provider}")
+
+    @staticmethod
+    def collection_name_for(base_name: str, provider: str, model: str) -> str:
+        """One collection per embedding model; the default model keeps the unsuffixed name."""
+        if provider == 'default':
+            return base_name
+        slug = re.sub(r'[^a-zA-Z0-9_-]+', '_', model)
+        return f"{base_name}_{slug}"[:63].strip('_-')
 
     async def initialize(self):
         logger.info("Initializing RAG service...")
         try:
+            self.missing_cache.clear()
             self.client = chromadb.PersistentClient(path=self.storage_path)
             self.collection = self.client.get_or_create_collection(
-                name=Config.CHROMA_COLLECTION_NAME,
+                name=self.collection_name,
+                embedding_function=self.embedding_function,
                 metadata={"hnsw:space": "cosine"} 
             )
-            logger.info(f"RAG service initialized with storage path: {self.storage_path}")
+            self.chunk_collection = self.client.get_or_create_collection(
+                name=self.chunk_collection_name,
+                embedding_function=self.embedding_function,
+                metadata={"hnsw:space": "cosine"}
+            )
+            await self.embedder.initialize()
+            await self.content_index.initialize()
+            if len(self.content_index) == 0:
+                await self._backfill_content_index()
+            logger.info(f"RAG service initialized with storage path: {self.storage_path}, collection: {self.collection_name} ({self.embedding_model})")
         except Exception as e:
             logger.exception("Failed to initialize RAG service")
             raise RuntimeError(f"Failed to initialize RAG service: {str(e)}")
@@ -34,27 +79,55 @@ class RAGService:
         if text is None:
             return ''  
         return hashlib.md5(str(text).encode()).hexdigest()
+
+    @staticmethod
+    def compute_file_hash(stream: BinaryIO, block_size: int = 1024 * 1024) -> str:
+        """Hashes a binary stream block by block without loading it all at once."""
+        digest = hashlib.sha256()
+        for block in iter(lambda: stream.read(block_size), b''):
+            digest.update(block)
+        return digest.hexdigest()
+
+    async def _backfill_content_index(self):
+        """One-time migration: builds the hash index from existing Chroma metadata."""
+        batch_size = 1000
+        offset = 0
+        entries = []
+        while True:
+            results = await asyncio.to_thread(self.collection.get, include=['metadatas'], limit=batch_size, offset=offset)
+            ids = results.get("ids") or []
+            for doc_id, meta in zip(ids, results.get("metadatas") or []):
+                meta = meta or {}
+                entries.append((meta.get('content_hash'), doc_id))
+                entries.append((meta.get('file_hash'), doc_id))
+            if len(ids) < batch_size:
+                break
+            offset += batch_size
+        await self.content_index.add_many(entries)
+        if entries:
+            logger.info(f"Backfilled content hash index with {len(self.content_index)} entries")
     
     async def get_document_by_content_hash(self, content_hash: str) -> Optional[Dict[str, Any]]:
         await self._ensure_initialized()
         try:
-            results = await asyncio.to_thread(
-                self.collection.get,
-                where={"content_hash": content_hash},
-                include=['metadatas']
-            )
-            if results is not None and results.get("ids"):
-                doc_id = results["ids"][0]
-                doc = {
-                    "id": doc_id,
-                    "text": results.get("documents", [None])[0] if results.get("documents") else None,
-                    "metadata": results.get("metadatas", [{}])[0] if results.get("metadatas") else {},
-                    "content_hash": content_hash,
-                    "chunks": results.get("metadatas", [{}])[0].get('chunks', 0) if results.get("metadatas") else 0
-                }
-                self.cache[doc_id] = doc
-                return doc
-            return None
+            doc_id = self.content_index.get(content_hash)
+            if doc_id is None:
+                return None
+            if doc_id in self.cache:
+                return self.cache[doc_id]
+            results = await asyncio.to_thread(self.collection.get, ids=[doc_id], include=['metadatas'])
+            if not results or not results.get("ids"):
+                logger.warning(f"Content hash index points at missing document: {doc_id}")
+                await self.content_index.remove([doc_id])
+                return None
+            metadata = (results.get("metadatas") or [{}])[0] or {}
+            return {
+                "id": doc_id,
+                "text": None,
+                "metadata": metadata,
+                "content_hash": content_hash,
+                "chunks": metadata.get('chunks', 0)
+            }
         except Exception as e:
             logger.exception(f"Error retrieving document by content hash: {content_hash}")
             return None
@@ -79,13 +152,10 @@ class RAGService:
             raise RuntimeError(f"Error updating document metadata: {str(e)}")
 
     async def _generate_unique_doc_id(self, base_doc_id: str) -> str:
+        """Returns ``base_doc_id``, or ``name_N.ext`` when another document already uses it."""
         doc_id = base_doc_id
         counter = 1
         while await self.document_exists(doc_id):
-            existing_doc = await self.retrieve_document(doc_id)
-            if existing_doc and existing_doc.get('content_hash') == self.compute_content_hash(existing_doc.get('text', '')):
-                # If the document with this ID has the same content, return this ID
-                return doc_id
             name, ext = os.path.splitext(base_doc_id)
             doc_id = f"{name}_{counter}{ext}"
             counter += 1
@@ -96,13 +166,18 @@ class RAGService:
         try:
             if doc_id in self.cache:
                 return True
-            results = await asyncio.to_thread(self.collection.get, ids=[doc_id], include=['metadatas'])
-            return results is not None and bool(results.get("ids"))
+            if doc_id in self.missing_cache:
+                return False
+            results = await asyncio.to_thread(self.collection.get, ids=[doc_id], include=[])
+            exists = results is not None and bool(results.get("ids"))
+            if not exists:
+                self.missing_cache[doc_id] = True
+            return exists
         except Exception as e:
             logger.exception(f"Error checking document existence: {doc_id}")
             return False
 
-    async def store_document(self, text: str, doc_id: str, metadata: Optional[Dict[str, Any]] = None) -> Tuple[str, bool, Dict[str, Any]]:
+    async def store_document(self, text: str, doc_id: str, metadata: Optional[Dict[str, Any]] = None, file_hash: Optional[str] = None) -> Tuple[str, bool, Dict[str, Any]]:
         await self._ensure_initialized()
         try:
             content_hash = self.compute_content_hash(text)
@@ -123,10 +198,32 @@ class RAGService:
             # Ensure required metadata fields are present
             filtered_metadata['content_hash'] = content_hash
             filtered_metadata['original_filename'] = doc_id
+            if file_hash:
+                filtered_metadata['file_hash'] = file_hash
 
-            await asyncio.to_thread(self.collection.add, documents=[text], ids=[doc_id], metadatas=[filtered_metadata])
+            embeddings = await self.embedder.embed([text])
+            async with self.store_lock:
+                # Different content under a name that is taken gets its own id; Chroma's add
+                # would otherwise ignore it and the chunks would overwrite the other document's
+                base_doc_id = doc_id
+                doc_id = await self._generate_unique_doc_id(base_doc_id)
+                if doc_id != base_doc_id:
+                    logger.info(f"Document id {base_doc_id} is taken by different content, storing as {doc_id}")
+                await asyncio.to_thread(self.collection.add, documents=[text], ids=[doc_id], embeddings=embeddings, metadatas=[filtered_metadata])
+                # add skips ids that already exist without an error, so confirm this content was written
+                # before the index sends its hashes to doc_id
+                stored = await asyncio.to_thread(self.collection.get, ids=[doc_id], include=['metadatas'])
+                stored_metadata = (stored.get("metadatas") or [None])[0] or {}
+                if stored_metadata.get('content_hash') != content_hash:
+                    raise RuntimeError(f"Document id {doc_id} is already taken by different content")
+                try:
+                    await self.content_index.add(doc_id, [content_hash, file_hash])
+                except Exception:
+                    await asyncio.to_thread(self.collection.delete, ids=[doc_id])
+                    raise
             doc_info = {"id": doc_id, "text": text, "metadata": filtered_metadata, "content_hash": content_hash}
             self.cache[doc_id] = doc_info
+            self.missing_cache.pop(doc_id, None)
             
             logger.info(f"Document stored: {doc_id}")
             
@@ -141,11 +238,14 @@ class RAGService:
         logger.info("Cleaning up RAG service...")
         self.client = None
         self.collection = None
+        self.chunk_collection = None
+        await self.content_index.cleanup()
+        await self.embedder.cleanup()
         self.cache.clear()
         logger.info("RAG service cleaned up")
 
     async def _ensure_initialized(self):
-        if not self.client or not self.collection:
+        if not self.client or not self.collection or not self.chunk_collection:
             await self.initialize()
 
     async def retrieve_document(self, doc_id: str) -> Optional[Dict[str, Any]]:
@@ -159,36 +259,28 @@ class RAGService:
                     return None
                 return cached_doc
 
+            if doc_id in self.missing_cache:
+                logger.info(f"Document known to be missing: {doc_id}")
+                return None
+
             logger.info(f"Retrieving document from collection: {doc_id}")
-            results = await asyncio.to_thread(self.collection.get, ids=[doc_id], include=['metadatas'])
-            
-            logger.debug(f"Raw results from collection.get: {results}")  # Add this line for debugging
+            results = await asyncio.to_thread(self.collection.get, ids=[doc_id], include=['documents', 'metadatas'])
 
             if not results or not results.get("ids"):
                 logger.warning(f"Document not found in collection: {doc_id}")
-                # Fallback to searching all documents
-                all_docs = await self.get_all_documents()
-                doc = next((d for d in all_docs if d['id'] == doc_id), None)
-                if doc:
-                    logger.info(f"Document found in all documents: {doc_id}")
-                    return doc
+                self.missing_cache[doc_id] = True
                 return None
 
+            metadata = (results.get("metadatas") or [{}])[0] or {}
             doc = {
                 "id": doc_id,
-                "text": results.get("documents", [None])[0] if results.get("documents") else None,
-                "metadata": results.get("metadatas", [{}])[0] if results.get("metadatas") else {},
-                "content_hash": (results.get("metadatas", [{}])[0] or {}).get('content_hash')
+                "text": (results.get("documents") or [None])[0],
+                "metadata": metadata,
+                "content_hash": metadata.get('content_hash')
             }
 
             if not doc['text']:
                 logger.warning(f"Retrieved document {doc_id} has no text content")
-                # Fallback to searching all documents
-                all_docs = await self.get_all_documents()
-                full_doc = next((d for d in all_docs if d['id'] == doc_id), None)
-                if full_doc and full_doc.get('text'):
-                    logger.info(f"Full document content found in all documents: {doc_id}")
-                    return full_doc
                 return None
 
             self.cache[doc_id] = doc
@@ -202,9 +294,10 @@ class RAGService:
     async def search_documents(self, query: str, n_results: int = 5, filter: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
         await self._ensure_initialized()
         try:
+            query_embedding = await self.embedder.embed_query(query)
             results = await asyncio.to_thread(
                 self.collection.query, 
-                query_texts=[query], 
+                query_embeddings=[query_embedding], 
                 n_results=n_results,
                 where=filter
             )
@@ -214,10 +307,137 @@ class RAGService:
             logger.exception(f"Error searching documents: {query}")
             raise RuntimeError(f"Error searching documents: {str(e)}")
 
+    async def _bulk_write(self, collection: chromadb.Collection, ids: List[str], texts: List[str],
+                          metadatas: Optional[List[Dict[str, Any]]], embeddings: Optional[List[List[float]]] = None):
+        """Embeds all texts in one batched call and upserts them with as few Chroma writes as possible."""
+        if embeddings is None:
+            # The embedder splits this into EMBEDDING_BATCH_SIZE calls
+            embeddings = await self.embedder.embed(texts)
+
+        # Chroma rejects writes larger than its max batch size, so only split when we have to
+        max_batch_size = self.client.get_max_batch_size()
+        for i in range(0, len(ids), max_batch_size):
+            await asyncio.to_thread(
+                collection.upsert,
+                ids=ids[i:i+max_batch_size],
+                documents=texts[i:i+max_batch_size],
+                embeddings=embeddings[i:i+max_batch_size],
+                metadatas=metadatas[i:i+max_batch_size] if metadatas else None
+            )
+
+    async def bulk_store_documents(self, records: List[Tuple[str, str, Optional[Dict[str, Any]]]]) -> List[Tuple[str, bool]]:
+        """Stores many ``(text, doc_id, metadata)`` records at once.
+
+        The whole batch is deduplicated against the content hash index (and
+        against itself), the new texts are embedded together and written with a
+        single upsert. Returns ``(doc_id, is_new)`` per record, where ``doc_id``
+        is the existing document's id for duplicates.
+        """
+        await self._ensure_initialized()
+        try:
+            results: List[Tuple[str, bool]] = []
+            new_docs: Dict[str, Tuple[str, Dict[str, Any], str]] = {}
+            batch_hashes: Dict[str, str] = {}
+            hashes = [self.compute_content_hash(text) for text, _, _ in records]
+            # Ids about to receive different content can no longer stand in for their old content
+            replaced_ids = {
+                doc_id for (_, doc_id, _), content_hash in zip(records, hashes)
+                if content_hash not in self.content_index.get_hashes(doc_id)
+            }
+            for (text, doc_id, metadata), content_hash in zip(records, hashes):
+                existing_id = self.content_index.get(content_hash)
+                if existing_id in replaced_ids:
+                    existing_id = None
+                existing_id = existing_id or batch_hashes.get(content_hash)
+                if existing_id:
+                    results.append((existing_id, False))
+                    continue
+                filtered_metadata = {k: v for k, v in (metadata or {}).items() if v is not None}
+                filtered_metadata['content_hash'] = content_hash
+                filtered_metadata['original_filename'] = doc_id
+                if doc_id in new_docs:
+                    batch_hashes.pop(new_docs[doc_id][2], None)
+                new_docs[doc_id] = (text, filtered_metadata, content_hash)
+                batch_hashes[content_hash] = doc_id
+                results.append((doc_id, True))
+
+            if new_docs:
+                ids = list(new_docs)
+                texts = [new_docs[doc_id][0] for doc_id in ids]
+                metadatas = [new_docs[doc_id][1] for doc_id in ids]
+                await self._bulk_write(self.collection, ids, texts, metadatas)
+                try:
+                    # Only once the upsert succeeded: hashes of any content it overwrote stop pointing at these ids
+                    await self.content_index.replace([(new_docs[doc_id][2], doc_id) for doc_id in ids])
+                except Exception:
+                    await asyncio.to_thread(self.collection.delete, ids=ids)
+                    raise
+                for doc_id, text, metadata in zip(ids, texts, metadatas):
+                    self.cache[doc_id] = {"id": doc_id, "text": text, "metadata": metadata, "content_hash": metadata['content_hash']}
+                    self.missing_cache.pop(doc_id, None)
+
+            logger.info(f"Bulk stored {len(new_docs)} new documents, {len(records) - len(new_docs)} duplicates skipped")
+            return results
+        except Exception as e:
+            logger.exception("Error bulk storing documents")
+            raise RuntimeError(f"Error bulk storing documents: {str(e)}")
+
+    async def store_chunks(self, parent_id: str, texts: List[str], metadatas: List[Dict[str, Any]]) -> int:
+        """Embeds the chunks of one document in batches and stores them in a single write."""
+        await self._ensure_initialized()
+        try:
+            if not texts:
+                return 0
+            ids = [f"{parent_id}_chunk_{i}" for i in range(len(texts))]
+            chunk_metadatas = [
+                {**{k: v for k, v in (meta or {}).items() if v is not None}, "parent_id": parent_id, "chunk_index": i}
+                for i, meta in enumerate(metadatas)
+            ]
+
+            # Embedded first, so a failed embedding leaves the previous chunks in place
+            embeddings = await self.embedder.embed(texts)
+            # Chunks of an earlier version beyond the new chunk count would otherwise linger in retrieval
+            await asyncio.to_thread(self.chunk_collection.delete, where={"parent_id": parent_id})
+            await self._bulk_write(self.chunk_collection, ids, texts, chunk_metadatas, embeddings)
+            logger.info(f"Stored {len(ids)} chunks for document: {parent_id}")
+            return len(ids)
+        except Exception as e:
+            logger.exception(f"Error storing chunks for document: {parent_id}")
+            raise RuntimeError(f"Error storing chunks for document: {str(e)}")
+
+    async def search_chunks(self, query: str, n_results: int = 10, parent_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        await self._ensure_initialized()
+        try:
+            query_embedding = await self.embedder.embed_query(query)
+            results = await asyncio.to_thread(
+                self.chunk_collection.query,
+                query_embeddings=[query_embedding],
+                n_results=n_results,
+                where={"parent_id": parent_id} if parent_id else None
+            )
+            logger.info(f"Chunk search completed for query: {query}")
+            return [{"id": id, "text": doc, "metadata": meta} for id, doc, meta in zip(results["ids"][0], results["documents"][0], results["metadatas"][0])]
+        except Exception as e:
+            logger.exception(f"Error searching chunks: {query}")
+            raise RuntimeError(f"Error searching chunks: {str(e)}")
+
+    async def has_chunks(self, doc_id: str) -> bool:
+        await self._ensure_initialized()
+        result = await asyncio.to_thread(self.chunk_collection.get, where={"parent_id": doc_id}, limit=1, include=[])
+        return bool(result["ids"])
+
+    async def set_chunk_count(self, doc_id: str, count: int):
+        """Records on the parent document how many chunks it was split into."""
+        await self._ensure_initialized()
+        await asyncio.to_thread(self.collection.update, ids=[doc_id], metadatas=[{"chunks": count}])
+        self.cache.pop(doc_id, None)
+
     async def delete_document(self, doc_id: str) -> bool:
         await self._ensure_initialized()
         try:
             await asyncio.to_thread(self.collection.delete, ids=[doc_id])
+            await asyncio.to_thread(self.chunk_collection.delete, where={"parent_id": doc_id})
+            await self.content_index.remove([doc_id])
             if doc_id in self.cache:
                 del self.cache[doc_id]
             logger.info(f"Document deleted successfully: {doc_id}")
@@ -229,14 +449,12 @@ class RAGService:
     async def batch_store_documents(self, texts: List[str], doc_ids: List[str], metadatas: Optional[List[Dict[str, Any]]] = None) -> bool:
         await self._ensure_initialized()
         try:
-            batch_size = 1000  # Adjust this based on your system's capabilities
-            for i in range(0, len(doc_ids), batch_size):
-                batch_texts = texts[i:i+batch_size]
-                batch_ids = doc_ids[i:i+batch_size]
-                batch_metadatas = metadatas[i:i+batch_size] if metadatas else None
-                await asyncio.to_thread(self.collection.add, documents=batch_texts, ids=batch_ids, metadatas=batch_metadatas)
-                for id, text, meta in zip(batch_ids, batch_texts, batch_metadatas or [None]*len(batch_ids)):
-                    self.cache[id] = {"text": text, "metadata": meta}
+            await self._bulk_write(self.collection, doc_ids, texts, metadatas)
+            # The upsert may have overwritten existing documents, so their index entries are replaced too
+            await self.content_index.replace([(self.compute_content_hash(text), id) for id, text in zip(doc_ids, texts)])
+            for id, text, meta in zip(doc_ids, texts, metadatas or [None]*len(doc_ids)):
+                self.cache[id] = {"id": id, "text": text, "metadata": meta}
+                self.missing_cache.pop(id, None)
             logger.info(f"Batch storage successful for {len(doc_ids)} documents")
             return True
         except Exception as e:
@@ -267,12 +485,17 @@ class RAGService:
     async def clear_all_documents(self) -> bool:
         await self._ensure_initialized()
         try:
-            all_ids = await asyncio.to_thread(lambda: self.collection.get()["ids"])
+            all_ids = await asyncio.to_thread(lambda: self.collection.get(include=[])["ids"])
+            chunk_ids = await asyncio.to_thread(lambda: self.chunk_collection.get(include=[])["ids"])
+            if chunk_ids:
+                await asyncio.to_thread(self.chunk_collection.delete, ids=chunk_ids)
             if all_ids:
                 await asyncio.to_thread(self.collection.delete, ids=all_ids)
-                logger.info(f"All documents ({len(all_ids)}) cleared from the RAG system")
+                logger.info(f"All documents ({len(all_ids)}) and chunks ({len(chunk_ids)}) cleared from the RAG system")
             else:
                 logger.info("No documents to clear from the RAG system")
+            await self.content_index.clear()
+            self.cache.clear()
             return True
         except Exception as e:
             logger.exception("Error clearing all documents")
@@ -281,7 +504,19 @@ class RAGService:
     async def update_document(self, doc_id: str, new_text: str, new_metadata: Optional[Dict[str, Any]] = None) -> bool:
         await self._ensure_initialized()
         try:
-            await asyncio.to_thread(self.collection.update, ids=[doc_id], documents=[new_text], metadatas=[new_metadata] if new_metadata else None)
+            content_hash = self.compute_content_hash(new_text)
+            # The updated text has no page boundaries, so it is chunked as a single page
+            splits = PDFService.split_pages([new_text])
+            # Chroma cannot drop a metadata key, so the old file's hash is blanked unless a new one is given
+            metadata = {'file_hash': '', **(new_metadata or {}), 'content_hash': content_hash, 'chunks': len(splits)}
+            embeddings = await self.embedder.embed([new_text])
+            await asyncio.to_thread(self.collection.update, ids=[doc_id], documents=[new_text], embeddings=embeddings,
+                                    metadatas=[metadata])
+            self.cache.pop(doc_id, None)
+            # The old content and file hashes no longer describe this document
+            await self.content_index.replace([(content_hash, doc_id), (metadata.get('file_hash'), doc_id)])
+            # store_chunks drops the old chunks, so retrieval only sees the new text
+            await self.store_chunks(doc_id, [split.page_content for split in splits], [split.metadata for split in splits])
             logger.info(f"Document updated successfully: {doc_id}")
             return True
         except Exception as e:
@@ -298,22 +533,58 @@ class RAGService:
             logger.exception("Error getting collection stats")
             raise RuntimeError(f"Error getting collection stats: {str(e)}")
         
-    async def get_all_documents(self, limit: int = 1000) -> List[Dict[str, Any]]:
+    DOCUMENT_FIELDS = {
+        "ids": [],
+        "metadata": ['metadatas'],
+        "preview": ['documents', 'metadatas'],
+        "full": ['documents', 'metadatas'],
+    }
+
+    async def get_documents_page(self, cursor: int = 0, limit: int = Config.DOCUMENTS_PAGE_SIZE, fields: str = "full",
+                                 preview_chars: int = Config.DOCUMENT_PREVIEW_CHARS) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        """Returns one page of documents starting at offset ``cursor`` and the cursor of the next page."""
+        if fields not in self.DOCUMENT_FIELDS:
+            raise ValueError(f"Invalid fields projection: {fields}")
         await self._ensure_initialized()
         try:
             results = await asyncio.to_thread(
                 self.collection.get,
-                limit=limit
+                limit=limit,
+                offset=cursor,
+                include=self.DOCUMENT_FIELDS[fields]
             )
+            ids = results["ids"]
+            texts = results.get("documents") or [None] * len(ids)
+            metadatas = results.get("metadatas") or [None] * len(ids)
             documents = []
-            for id, text, metadata in zip(results["ids"], results["documents"], results["metadatas"]):
-                documents.append({
-                    "id": id,
-                    "text": text,
-                    "metadata": metadata
-                })
-            logger.info(f"Retrieved {len(documents)} documents")
-            return documents
+            for id, text, metadata in zip(ids, texts, metadatas):
+                document = {"id": id}
+                if fields != "ids":
+                    document["metadata"] = metadata
+                if fields == "full":
+                    document["text"] = text
+                elif fields == "preview":
+                    document["text"] = text[:preview_chars] if text else text
+                documents.append(document)
+            next_cursor = cursor + len(ids) if len(ids) == limit else None
+            return documents, next_cursor
         except Exception as e:
-            logger.exception("Error retrieving all documents")
-            raise RuntimeError(f"Error retrieving all documents: {str(e)}")
\ No newline at end of file
+            logger.exception(f"Error retrieving documents page at cursor {cursor}")
+            raise RuntimeError(f"Error retrieving documents page: {str(e)}")
+
+    async def iter_documents(self, cursor: int = 0, limit: Optional[int] = None, fields: str = "full",
+                             preview_chars: int = Config.DOCUMENT_PREVIEW_CHARS) -> AsyncGenerator[Dict[str, Any], None]:
+        """Yields documents page by page so only one page is held in memory at a time."""
+        remaining = limit
+        while cursor is not None and (remaining is None or remaining > 0):
+            page_size = Config.DOCUMENTS_PAGE_SIZE if remaining is None else min(remaining, Config.DOCUMENTS_PAGE_SIZE)
+            documents, cursor = await self.get_documents_page(cursor, page_size, fields, preview_chars)
+            for document in documents:
+                yield document
+            if remaining is not None:
+                remaining -= len(documents)
+
+    async def get_all_documents(self, limit: int = 1000) -> List[Dict[str, Any]]:
+        documents, _ = await self.get_documents_page(0, limit, "full")
+        logger.info(f"Retrieved {len(documents)} documents")
+        return documents
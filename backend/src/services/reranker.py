@@ -0,0 +1,243 @@
+import asyncio
+import hashlib
+import logging
+import os
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from cachetools import LRUCache
+from src.config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class TorchCrossEncoder:
+    """Scores pairs with the sentence-transformers CrossEncoder on PyTorch."""
+
+    def __init__(self, model_name: str, threads: int = 0):
+        import torch
+        from sentence_transformers import CrossEncoder
+        if threads > 0:
+            torch.set_num_threads(threads)
+        self.model = CrossEncoder(model_name)
+        self.identity = torch.nn.Identity()
+
+    def predict(self, pairs: List[Tuple[str, str]], batch_size: int) -> List[float]:
+        # Raw logits, so scores are comparable with the ONNX backend
+        scores = self.model.predict(pairs, batch_size=batch_size, show_progress_bar=False, activation_fn=self.identity)
+        return [float(score) for score in scores]
+
+
+class OnnxCrossEncoder:
+    """Scores pairs with an ONNX export of the cross-encoder on onnxruntime.
+
+    Only ``tokenizers`` and ``onnxruntime`` are loaded, not PyTorch. By default
+    the int8-quantized export published in the model's Hub repository is used;
+    ``model_path`` points at a local .onnx file instead, with its
+    ``tokenizer.json`` next to it.
+    """
+
+    def __init__(self, model_name: str, file_name: str = Config.RERANK_ONNX_FILE, model_path: str = Config.RERANK_ONNX_PATH,
+                 threads: int = 0, max_length: int = Config.RERANK_MAX_LENGTH):
+        import onnxruntime
+        from tokenizers import Tokenizer
+        if model_path:
+            tokenizer_path = os.path.join(os.path.dirname(model_path), 'tokenizer.json')
+        else:
+            from huggingface_hub import hf_hub_download
+            model_path = hf_hub_download(model_name, file_name)
+            tokenizer_path = hf_hub_download(model_name, 'tokenizer.json')
+
+        self.tokenizer = Tokenizer.from_file(tokenizer_path)
+        self.tokenizer.enable_truncation(max_length=max_length)
+        self.tokenizer.enable_padding()
+        options = onnxruntime.SessionOptions()
+        if threads > 0:
+            options.intra_op_num_threads = threads
+        self.session = onnxruntime.InferenceSession(model_path, options, providers=['CPUExecutionProvider'])
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+
+    def predict(self, pairs: List[Tuple[str, str]], batch_size: int) -> List[float]:
+        import numpy as np
+        scores = []
+        for i in range(0, len(pairs), batch_size):
+            encodings = self.tokenizer.encode_batch(pairs[i:i + batch_size])
+            inputs = {
+                "input_ids": np.array([encoding.ids for encoding in encodings], dtype=np.int64),
+                "attention_mask": np.array([encoding.attention_mask for encoding in encodings], dtype=np.int64),
+                "token_type_ids": np.array([encoding.type_ids for encoding in encodings], dtype=np.int64),
+            }
+            logits = self.session.run(None, {name: value for name, value in inputs.items() if name in self.input_names})[0]
+            scores.extend(float(score) for score in logits.reshape(len(encodings), -1)[:, 0])
+        return scores
+
+
+RERANK_BACKENDS = {
+    "torch": TorchCrossEncoder,
+    "onnx": OnnxCrossEncoder,
+}
+
+
+class Reranker:
+    """Cross-encoder scorer that merges concurrent requests into shared batches.
+
+    Each call to ``score`` queues its (query, passage) pairs. A single worker
+    takes whatever is queued, waits up to ``RERANK_MAX_WAIT_MS`` for more pairs
+    until ``RERANK_BATCH_SIZE`` is reached, and scores everything in one
+    model call. Requests that arrive while a batch is running
+    are picked up together by the next one, so only one forward pass occupies
+    the CPU at a time. The scoring backend (PyTorch or ONNX) is picked with
+    ``RERANK_BACKEND``. Scores are cached per (model, normalized query, passage
+    hash), so only pairs that were not scored before reach the model.
+    """
+
+    def __init__(self, model_name: str = Config.RERANK_MODEL, batch_size: int = Config.RERANK_BATCH_SIZE,
+                 max_wait_ms: int = Config.RERANK_MAX_WAIT_MS, torch_threads: int = Config.RERANK_TORCH_THREADS,
+                 cache_size: int = Config.RERANK_CACHE_SIZE, backend: str = Config.RERANK_BACKEND):
+        if backend not in RERANK_BACKENDS:
+            raise ValueError(f"Unknown reranker backend: {backend}")
+        self.model_name = model_name
+        self.backend = backend
+        self.batch_size = batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.torch_threads = torch_threads
+        self.model: Optional[Any] = None
+        self.queue: Optional[asyncio.Queue] = None
+        self.worker: Optional[asyncio.Task] = None
+        self.cache = LRUCache(maxsize=cache_size)
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.predict_seconds = 0.0
+        self.batch_count = 0
+        self.request_count = 0
+        self.pair_count = 0
+
+    async def initialize(self):
+        if self.model is None:
+            logger.info(f"Loading cross-encoder {self.model_name} ({self.backend} backend)")
+            self.model = await asyncio.to_thread(self._load_model)
+        if self.worker is None:
+            self.queue = asyncio.Queue()
+            self.worker = asyncio.create_task(self._run())
+
+    def _load_model(self) -> Any:
+        return RERANK_BACKENDS[self.backend](self.model_name, threads=self.torch_threads)
+
+    async def cleanup(self):
+        if self.worker is not None:
+            self.worker.cancel()
+            try:
+                await self.worker
+            except asyncio.CancelledError:
+                pass
+            self.worker = None
+        if self.queue is not None:
+            while not self.queue.empty():
+                _, future = self.queue.get_nowait()
+                future.cancel()
+            self.queue = None
+
+    def cache_key(self, query: str, passage: str) -> Tuple[str, str, str]:
+        normalized_query = ' '.join(query.lower().split())
+        return f"{self.model_name}:{self.backend}", normalized_query, hashlib.sha256(passage.encode('utf-8')).hexdigest()
+
+    async def score(self, query: str, passages: Sequence[str]) -> List[float]:
+        """Returns the relevance score of each passage for ``query``."""
+        if not passages:
+            return []
+        keys = [self.cache_key(query, passage) for passage in passages]
+        scores: List[Optional[float]] = [self.cache.get(key) for key in keys]
+        missing = [i for i, score in enumerate(scores) if score is None]
+        self.cache_hits += len(passages) - len(missing)
+        self.cache_misses += len(missing)
+        if not missing:
+            return scores
+
+        if self.worker is None:
+            await self.initialize()
+        future = asyncio.get_running_loop().create_future()
+        self.queue.put_nowait(([(query, passages[i]) for i in missing], future))
+        for i, score in zip(missing, await future):
+            scores[i] = self.cache[keys[i]] = score
+        return scores
+
+    async def rank(self, query: str, passages: Sequence[str], top_k: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Same result shape as ``CrossEncoder.rank``: dicts with corpus_id and score, best first."""
+        scores = await self.score(query, passages)
+        ranks = sorted(
+            ({"corpus_id": i, "score": score} for i, score in enumerate(scores)),
+            key=lambda rank: rank["score"], reverse=True
+        )
+        return ranks[:top_k] if top_k is not None else ranks
+
+    async def _next_batch(self) -> List[Tuple[List[Tuple[str, str]], asyncio.Future]]:
+        loop = asyncio.get_running_loop()
+        batch = [await self.queue.get()]
+        size = len(batch[0][0])
+        deadline = loop.time() + self.max_wait
+        while size < self.batch_size:
+            if self.queue.empty():
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self.queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+            else:
+                item = self.queue.get_nowait()
+            batch.append(item)
+            size += len(item[0])
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._next_batch()
+            # Callers that went away no longer need their pairs scored
+            batch = [(pairs, future) for pairs, future in batch if not future.done()]
+            if not batch:
+                continue
+            pairs = [pair for item_pairs, _ in batch for pair in item_pairs]
+            try:
+                scores = await asyncio.to_thread(self._predict, pairs)
+            except Exception as e:
+                logger.error(f"Error scoring {len(pairs)} pairs with cross-encoder: {str(e)}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            self.batch_count += 1
+            self.request_count += len(batch)
+            self.pair_count += len(pairs)
+            offset = 0
+            for item_pairs, future in batch:
+                if not future.done():
+                    future.set_result(scores[offset:offset + len(item_pairs)])
+                offset += len(item_pairs)
+
+    def _predict(self, pairs: List[Tuple[str, str]]) -> List[float]:
+        start = time.perf_counter()
+        scores = self.model.predict(pairs, batch_size=self.batch_size)
+        self.predict_seconds += time.perf_counter() - start
+        return scores
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Return current batching and score cache metrics."""
+        lookups = self.cache_hits + self.cache_misses
+        seconds_per_pair = self.predict_seconds / self.pair_count if self.pair_count > 0 else 0
+        return {
+            "model": self.model_name,
+            "backend": self.backend,
+            "batches": self.batch_count,
+            "requests": self.request_count,
+            "pairs": self.pair_count,
+            "average_requests_per_batch": self.request_count / self.batch_count if self.batch_count > 0 else 0,
+            "average_batch_size": self.pair_count / self.batch_count if self.batch_count > 0 else 0,
+            "queued": self.queue.qsize() if self.queue is not None else 0,
+            "cache_hits": self.cache_hits,
+            "cache_misses": self.cache_misses,
+            "cache_hit_rate": self.cache_hits / lookups if lookups > 0 else 0,
+            "cache_size": len(self.cache),
+            "predict_seconds": self.predict_seconds,
+            # Estimated from the average model time per scored pair
+            "estimated_seconds_saved": self.cache_hits * seconds_per_pair,
+        }
@@ -0,0 +1,180 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Set, Tuple
+from cachetools import LRUCache
+from src.config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class SearchCache:
+    """Persistent cache of external search results with stale-while-revalidate.
+
+    Results are keyed by source and normalized query and stored in SQLite with
+    an in-memory LRU in front. Within the source's TTL an entry is a ``hit``.
+    For ``SEARCH_CACHE_STALE_TTL`` seconds after that it is still served, as
+    ``stale``, while one background task refreshes it. Older or missing entries
+    are a ``miss`` and are fetched inline, with concurrent identical misses
+    sharing one fetch. A background refresh hands its new value to the caller's
+    ``on_refresh``, so whatever a miss does with fresh results happens for
+    refreshed ones too. Empty results are not cached, so a source outage is not
+    remembered. Values are kept serialized, so callers can modify what they get
+    back without touching the cache.
+    """
+
+    def __init__(self, db_path: str = Config.SEARCH_CACHE_DB_PATH, ttls: Dict[str, int] = Config.SEARCH_CACHE_TTLS,
+                 stale_ttl: int = Config.SEARCH_CACHE_STALE_TTL, memory_size: int = Config.SEARCH_CACHE_SIZE):
+        self.db_path = db_path
+        self.ttls = ttls
+        self.stale_ttl = stale_ttl
+        self.memory = LRUCache(maxsize=memory_size)
+        self.conn: Optional[sqlite3.Connection] = None
+        self.lock = threading.Lock()
+        self.in_flight: Dict[Tuple[str, str], asyncio.Future] = {}
+        self.refreshing: Set[Tuple[str, str]] = set()
+        self.tasks: Set[asyncio.Task] = set()
+        self.counts: Dict[str, Dict[str, int]] = {}
+
+    async def initialize(self):
+        logger.info(f"Opening search cache at {self.db_path}")
+        await asyncio.to_thread(self._open)
+
+    def _open(self):
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        with self.lock, self.conn:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute(
+                """CREATE TABLE IF NOT EXISTS search_results (
+                    source TEXT NOT NULL,
+                    query TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    fetched_at REAL NOT NULL,
+                    PRIMARY KEY (source, query)
+                )"""
+            )
+
+    async def cleanup(self):
+        for task in list(self.tasks):
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.memory.clear()
+        if self.conn is not None:
+            with self.lock:
+                self.conn.close()
+            self.conn = None
+
+    @staticmethod
+    def normalize_query(query: str) -> str:
+        return ' '.join(query.lower().split())
+
+    def _load(self, key: Tuple[str, str]) -> Optional[Tuple[str, float]]:
+        if self.conn is None:
+            return None
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT value, fetched_at FROM search_results WHERE source = ? AND query = ?", key
+            ).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def _save(self, key: Tuple[str, str], serialized: str, fetched_at: float):
+        if self.conn is None:
+            return
+        with self.lock, self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO search_results VALUES (?, ?, ?, ?)", (*key, serialized, fetched_at))
+
+    def _count(self, source: str, status: str):
+        counts = self.counts.setdefault(source, {"hit": 0, "stale": 0, "miss": 0})
+        counts[status] += 1
+
+    async def get_or_fetch(self, source: str, query: str, fetch: Callable[[], Awaitable[Any]],
+                           on_refresh: Optional[Callable[[Any], Awaitable[None]]] = None) -> Tuple[Any, str]:
+        """Returns ``(value, status)`` where status is 'hit', 'stale' or 'miss'."""
+        key = (source, self.normalize_query(query))
+        entry = self.memory.get(key)
+        if entry is None:
+            entry = await asyncio.to_thread(self._load, key)
+            if entry is not None:
+                self.memory[key] = entry
+
+        if entry is not None:
+            serialized, fetched_at = entry
+            value = json.loads(serialized)
+            age = time.time() - fetched_at
+            ttl = self.ttls.get(source, Config.SEARCH_CACHE_DEFAULT_TTL)
+            if age < ttl:
+                self._count(source, "hit")
+                return value, "hit"
+            if age < ttl + self.stale_ttl:
+                self._count(source, "stale")
+                self._refresh_in_background(key, fetch, on_refresh)
+                return value, "stale"
+
+        self._count(source, "miss")
+        return await self._fetch(key, fetch), "miss"
+
+    async def _fetch(self, key: Tuple[str, str], fetch: Callable[[], Awaitable[Any]]) -> Any:
+        pending = self.in_flight.get(key)
+        if pending is not None:
+            return await asyncio.shield(pending)
+
+        future = asyncio.get_running_loop().create_future()
+        self.in_flight[key] = future
+        try:
+            value = await fetch()
+            if value:
+                try:
+                    serialized = json.dumps(value, default=str)
+                    fetched_at = time.time()
+                    self.memory[key] = (serialized, fetched_at)
+                    await asyncio.to_thread(self._save, key, serialized, fetched_at)
+                except (sqlite3.Error, TypeError, ValueError) as e:
+                    logger.error(f"Error caching search results for {key}: {str(e)}")
+            future.set_result(value)
+            return value
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark the exception as retrieved so a future nobody joined does not log a warning
+            future.exception()
+            raise
+        finally:
+            self.in_flight.pop(key, None)
+
+    def _refresh_in_background(self, key: Tuple[str, str], fetch: Callable[[], Awaitable[Any]],
+                               on_refresh: Optional[Callable[[Any], Awaitable[None]]] = None):
+        if key in self.refreshing or key in self.in_flight:
+            return
+        self.refreshing.add(key)
+
+        async def refresh():
+            try:
+                value = await self._fetch(key, fetch)
+                if value and on_refresh is not None:
+                    await on_refresh(value)
+                logger.info(f"Refreshed stale search results for {key}")
+            except Exception as e:
+                logger.warning(f"Background refresh failed for {key}: {str(e)}")
+            finally:
+                self.refreshing.discard(key)
+
+        task = asyncio.create_task(refresh())
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Return hit, stale and miss counts per source."""
+        return {
+            "sources": self.counts,
+            "memory_size": len(self.memory),
+            "refreshing": len(self.refreshing),
+        }
@@ -0,0 +1,163 @@
+import asyncio
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+from cachetools import LRUCache
+from src.config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class SummaryCache:
+    """Two-tier, content-addressed cache for generated summaries.
+
+    Entries are keyed by the hash of the document text, the summary level, the
+    model name and the prompt version, so a summary is reused for identical
+    content regardless of which document id it was stored under. Lookups hit an
+    in-memory LRU first and fall back to a SQLite table that survives restarts.
+    Concurrent requests for the same key share a single computation.
+    """
+
+    def __init__(self, db_path: str = Config.SUMMARY_CACHE_DB_PATH, memory_size: int = Config.SUMMARY_CACHE_SIZE):
+        self.db_path = db_path
+        self.memory = LRUCache(maxsize=memory_size)
+        self.conn: Optional[sqlite3.Connection] = None
+        self.lock = threading.Lock()
+        self.in_flight: Dict[str, asyncio.Future] = {}
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    async def initialize(self):
+        logger.info(f"Opening summary cache at {self.db_path}")
+        await asyncio.to_thread(self._open)
+
+    def _open(self):
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        with self.lock, self.conn:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute(
+                """CREATE TABLE IF NOT EXISTS summaries (
+                    cache_key TEXT PRIMARY KEY,
+                    content_hash TEXT NOT NULL,
+                    level TEXT NOT NULL,
+                    model TEXT NOT NULL,
+                    prompt_version TEXT NOT NULL,
+                    summary TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                )"""
+            )
+
+    async def cleanup(self):
+        self.memory.clear()
+        if self.conn is not None:
+            with self.lock:
+                self.conn.close()
+            self.conn = None
+
+    @staticmethod
+    def hash_content(text: str) -> str:
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def make_key(content_hash: str, level: str, model: str = Config.OLLAMA_MODEL,
+                 prompt_version: str = Config.SUMMARY_PROMPT_VERSION) -> str:
+        return f"{content_hash}:{level}:{model}:{prompt_version}"
+
+    def _load(self, key: str) -> Optional[str]:
+        if self.conn is None:
+            return None
+        with self.lock:
+            row = self.conn.execute("SELECT summary FROM summaries WHERE cache_key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _save(self, key: str, content_hash: str, level: str, model: str, prompt_version: str, summary: str):
+        if self.conn is None:
+            return
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO summaries VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, content_hash, level, model, prompt_version, summary, time.time())
+            )
+
+    async def get(self, key: str) -> Optional[str]:
+        summary = self.memory.get(key)
+        if summary is not None:
+            self.memory_hits += 1
+            return summary
+        summary = await asyncio.to_thread(self._load, key)
+        if summary is not None:
+            self.disk_hits += 1
+            self.memory[key] = summary
+        return summary
+
+    async def get_or_compute(self, text: str, level: str, compute: Callable[[], Awaitable[str]],
+                             model: str = Config.OLLAMA_MODEL,
+                             prompt_version: str = Config.SUMMARY_PROMPT_VERSION) -> str:
+        """Returns the cached summary for ``text`` or computes and stores it once."""
+        content_hash = self.hash_content(text)
+        key = self.make_key(content_hash, level, model, prompt_version)
+
+        summary = self.memory.get(key)
+        if summary is not None:
+            self.memory_hits += 1
+            return summary
+
+        pending = self.in_flight.get(key)
+        if pending is not None:
+            self.coalesced += 1
+            logger.info(f"Joining in-flight summarization for {key}")
+            return await asyncio.shield(pending)
+
+        # Registered before the disk lookup, so concurrent callers share the lookup and any compute
+        future = asyncio.get_running_loop().create_future()
+        self.in_flight[key] = future
+        try:
+            summary = await asyncio.to_thread(self._load, key)
+            if summary is not None:
+                self.disk_hits += 1
+                self.memory[key] = summary
+                future.set_result(summary)
+                return summary
+
+            self.misses += 1
+            summary = await compute()
+            self.memory[key] = summary
+            try:
+                await asyncio.to_thread(self._save, key, content_hash, level, model, prompt_version, summary)
+            except sqlite3.Error as e:
+                logger.error(f"Error persisting summary {key}: {str(e)}")
+            future.set_result(summary)
+            return summary
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark the exception as retrieved so a future nobody joined does not log a warning
+            future.exception()
+            raise
+        finally:
+            self.in_flight.pop(key, None)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Return current cache metrics."""
+        lookups = self.memory_hits + self.disk_hits + self.misses + self.coalesced
+        hits = self.memory_hits + self.disk_hits + self.coalesced
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "coalesced": self.coalesced,
+            "misses": self.misses,
+            "hit_rate": hits / lookups if lookups > 0 else 0,
+            "memory_size": len(self.memory),
+            "memory_max_size": self.memory.maxsize,
+        }
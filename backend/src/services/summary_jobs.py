@@ -0,0 +1,201 @@
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+from src.config import Config
+from src.services.llm_executor import LLMQueueFullError, background_work
+
+logger = logging.getLogger(__name__)
+
+JOB_COLUMNS = ["id", "doc_id", "level", "status", "priority", "attempts", "error", "created_at", "updated_at"]
+
+
+class SummaryJobQueue:
+    """Persistent background queue that precomputes document summaries.
+
+    Jobs live in an SQLite table with one row per (doc_id, level). Workers claim
+    the highest-priority pending job and run it through
+    ``AIService.get_or_create_summary``, so the result lands in the summary
+    cache and a ``/summarize`` request that arrives while the job runs joins
+    the same computation. Failed jobs are retried with exponential backoff up
+    to ``SUMMARY_JOB_MAX_ATTEMPTS`` times. Jobs that were running when the
+    process stopped are picked up again on the next start. Job LLM calls run
+    in the executor's background lane, capped at ``LLM_BACKGROUND_WORKERS``.
+    """
+
+    def __init__(self, rag_service, ai_service, db_path: str = Config.SUMMARY_JOBS_DB_PATH,
+                 workers: int = Config.SUMMARY_JOB_WORKERS):
+        self.rag_service = rag_service
+        self.ai_service = ai_service
+        self.db_path = db_path
+        self.worker_count = workers
+        self.conn: Optional[sqlite3.Connection] = None
+        self.lock = threading.Lock()
+        self.wakeup = asyncio.Event()
+        self.workers: List[asyncio.Task] = []
+
+    async def initialize(self):
+        logger.info(f"Opening summary job queue at {self.db_path}")
+        await asyncio.to_thread(self._open)
+        self.workers = [asyncio.create_task(self._run_worker(i)) for i in range(self.worker_count)]
+        logger.info(f"Started {self.worker_count} summary job workers")
+
+    def _open(self):
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        with self.lock, self.conn:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute(
+                """CREATE TABLE IF NOT EXISTS summary_jobs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    doc_id TEXT NOT NULL,
+                    level TEXT NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    priority INTEGER NOT NULL DEFAULT 0,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    error TEXT,
+                    not_before REAL NOT NULL DEFAULT 0,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    UNIQUE (doc_id, level)
+                )"""
+            )
+            self.conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_summary_jobs_claim ON summary_jobs (status, priority DESC, created_at)"
+            )
+            # Jobs interrupted by a restart go back to the queue
+            self.conn.execute("UPDATE summary_jobs SET status = 'pending' WHERE status = 'running'")
+
+    async def cleanup(self):
+        for worker in self.workers:
+            worker.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
+        if self.conn is not None:
+            with self.lock:
+                self.conn.close()
+            self.conn = None
+
+    def _enqueue(self, doc_id: str, levels: List[str], priorities: Dict[str, int]):
+        now = time.time()
+        with self.lock, self.conn:
+            for level in levels:
+                # Re-queue failed jobs; leave pending, running and finished ones alone
+                self.conn.execute(
+                    """INSERT INTO summary_jobs (doc_id, level, priority, created_at, updated_at)
+                       VALUES (?, ?, ?, ?, ?)
+                       ON CONFLICT (doc_id, level) DO UPDATE SET
+                           status = 'pending', attempts = 0, error = NULL, not_before = 0,
+                           priority = excluded.priority, updated_at = excluded.updated_at
+                       WHERE summary_jobs.status = 'failed'""",
+                    (doc_id, level, priorities.get(level, 0), now, now)
+                )
+
+    async def enqueue(self, doc_id: str, levels: Optional[List[str]] = None,
+                      priorities: Optional[Dict[str, int]] = None):
+        """Queues summaries of ``doc_id`` for the given levels (all levels by default)."""
+        levels = levels or sorted(Config.ALLOWED_LEVELS)
+        priorities = priorities if priorities is not None else Config.SUMMARY_JOB_PRIORITIES
+        await asyncio.to_thread(self._enqueue, doc_id, levels, priorities)
+        self.wakeup.set()
+        logger.info(f"Queued summary jobs for {doc_id}: {', '.join(levels)}")
+
+    def _claim(self) -> Optional[Dict[str, Any]]:
+        with self.lock, self.conn:
+            row = self.conn.execute(
+                """SELECT id, doc_id, level, attempts FROM summary_jobs
+                   WHERE status = 'pending' AND not_before <= ?
+                   ORDER BY priority DESC, created_at LIMIT 1""",
+                (time.time(),)
+            ).fetchone()
+            if row is None:
+                return None
+            self.conn.execute(
+                "UPDATE summary_jobs SET status = 'running', updated_at = ? WHERE id = ?",
+                (time.time(), row['id'])
+            )
+        return dict(row)
+
+    def _finish(self, job_id: int, status: str, attempts: int, error: Optional[str] = None, not_before: float = 0):
+        with self.lock, self.conn:
+            self.conn.execute(
+                """UPDATE summary_jobs SET status = ?, attempts = ?, error = ?, not_before = ?, updated_at = ?
+                   WHERE id = ?""",
+                (status, attempts, error, not_before, time.time(), job_id)
+            )
+
+    async def _run_worker(self, number: int):
+        # Each worker runs in its own task context, so this only affects the job's LLM calls
+        background_work.set(True)
+        while True:
+            # Cleared before claiming, so an enqueue that races with an empty claim still wakes us
+            self.wakeup.clear()
+            try:
+                job = await asyncio.to_thread(self._claim)
+            except sqlite3.Error as e:
+                logger.error(f"Summary job worker {number} could not claim a job: {str(e)}")
+                job = None
+            if job is None:
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), timeout=Config.SUMMARY_JOB_POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self._run_job(job)
+
+    async def _run_job(self, job: Dict[str, Any]):
+        job_id, doc_id, level = job['id'], job['doc_id'], job['level']
+        attempts = job['attempts']
+        try:
+            doc = await self.rag_service.retrieve_document(doc_id)
+            if not doc or not doc.get('text'):
+                await asyncio.to_thread(self._finish, job_id, 'failed', attempts, "Document not found")
+                return
+            logger.info(f"Precomputing {level} summary for {doc_id}")
+            await self.ai_service.get_or_create_summary(doc['text'], level)
+            await asyncio.to_thread(self._finish, job_id, 'done', attempts + 1)
+        except asyncio.CancelledError:
+            # Shutting down; the job is reset to pending on the next start
+            raise
+        except LLMQueueFullError as e:
+            # Interactive traffic has the LLM busy; back off without using up an attempt
+            await asyncio.to_thread(self._finish, job_id, 'pending', attempts, str(e), time.time() + e.retry_after)
+        except Exception as e:
+            attempts += 1
+            if attempts >= Config.SUMMARY_JOB_MAX_ATTEMPTS:
+                logger.error(f"Summary job {job_id} for {doc_id} ({level}) failed permanently: {str(e)}")
+                await asyncio.to_thread(self._finish, job_id, 'failed', attempts, str(e))
+            else:
+                delay = Config.SUMMARY_JOB_RETRY_DELAY * 2 ** (attempts - 1)
+                logger.warning(f"Summary job {job_id} for {doc_id} ({level}) failed, retrying in {delay}s: {str(e)}")
+                await asyncio.to_thread(self._finish, job_id, 'pending', attempts, str(e), time.time() + delay)
+
+    def _query(self, sql: str, params: tuple) -> List[Dict[str, Any]]:
+        with self.lock:
+            rows = self.conn.execute(sql, params).fetchall()
+        return [dict(row) for row in rows]
+
+    async def get_job(self, job_id: int) -> Optional[Dict[str, Any]]:
+        rows = await asyncio.to_thread(
+            self._query, f"SELECT {', '.join(JOB_COLUMNS)} FROM summary_jobs WHERE id = ?", (job_id,)
+        )
+        return rows[0] if rows else None
+
+    async def get_jobs_for_document(self, doc_id: str) -> List[Dict[str, Any]]:
+        return await asyncio.to_thread(
+            self._query, f"SELECT {', '.join(JOB_COLUMNS)} FROM summary_jobs WHERE doc_id = ? ORDER BY level", (doc_id,)
+        )
+
+    async def get_metrics(self) -> Dict[str, Any]:
+        """Return job counts by status."""
+        rows = await asyncio.to_thread(self._query, "SELECT status, COUNT(*) AS count FROM summary_jobs GROUP BY status", ())
+        return {
+            "workers": len(self.workers),
+            "jobs": {row['status']: row['count'] for row in rows},
+        }
@@ -0,0 +1,31 @@
+import asyncio
+import numpy as np
+import pytest
+from chromadb import EmbeddingFunction
+from src.services.rag_service import RAGService
+
+
+class FakeEmbeddingFunction(EmbeddingFunction):
+    """Deterministic embeddings, so tests never load or call an embedding model."""
+
+    def __init__(self):
+        pass
+
+    def __call__(self, input):
+        return [np.array([float(len(text)), float(sum(map(ord, text)) % 97), 1.0]) for text in input]
+
+
+@pytest.fixture
+def with_rag(tmp_path):
+    """Runs ``scenario(rag_service)`` against an initialized RAGService stored under ``tmp_path``."""
+    def run(scenario):
+        async def main():
+            service = RAGService(str(tmp_path))
+            service.embedding_function = service.embedder.embedding_function = FakeEmbeddingFunction()
+            await service.initialize()
+            try:
+                return await scenario(service)
+            finally:
+                await service.cleanup()
+        return asyncio.run(main())
+    return run
@@ -0,0 +1,109 @@
+import asyncio
+import threading
+import pytest
+from src.services.llm_executor import LLMDeadlineExceededError, LLMExecutor, LLMQueueFullError, background_work
+
+
+def run(scenario, **options):
+    async def main():
+        executor = LLMExecutor(**{"max_workers": 1, "max_queue_size": 1, "default_timeout": 5,
+                                  "max_background_workers": 1, **options})
+        try:
+            return await scenario(executor)
+        finally:
+            await executor.cleanup()
+    return asyncio.run(main())
+
+
+async def wait_until(condition):
+    while not condition():
+        await asyncio.sleep(0.01)
+
+
+def test_full_queue_rejects_with_retry_after():
+    async def scenario(executor):
+        release = threading.Event()
+        running = asyncio.create_task(executor.run(release.wait))
+        await wait_until(lambda: executor.running == 1)
+        queued = asyncio.create_task(executor.run(lambda: "queued"))
+        await wait_until(lambda: executor.queue_depth == 1)
+
+        with pytest.raises(LLMQueueFullError) as rejected:
+            await executor.run(lambda: "rejected")
+        assert rejected.value.retry_after > 0
+        with pytest.raises(LLMQueueFullError):
+            executor.check_capacity()
+        assert executor.get_metrics()["rejected"] == 2
+
+        release.set()
+        assert await running is True
+        assert await queued == "queued"
+        executor.check_capacity()
+        assert executor.get_metrics()["completed"] == 2
+    run(scenario)
+
+
+def test_queued_request_expires_without_starting():
+    async def scenario(executor):
+        release = threading.Event()
+        started = []
+        running = asyncio.create_task(executor.run(release.wait))
+        await wait_until(lambda: executor.running == 1)
+
+        with pytest.raises(LLMDeadlineExceededError):
+            await executor.run(started.append, "late", timeout=0.05)
+        assert executor.queue_depth == 0
+        release.set()
+        await running
+        assert started == []
+        assert executor.get_metrics()["timed_out"] == 1
+    run(scenario)
+
+
+def test_running_request_past_its_deadline_keeps_its_worker():
+    async def scenario(executor):
+        release = threading.Event()
+        with pytest.raises(LLMDeadlineExceededError):
+            await executor.run(release.wait, timeout=0.05)
+        # The call cannot be interrupted, so its worker stays reserved until it returns
+        assert executor.running == 1
+        release.set()
+        await wait_until(lambda: executor.running == 0)
+        assert await executor.run(lambda: "next") == "next"
+    run(scenario)
+
+
+def test_slot_is_released_after_an_async_call():
+    async def scenario(executor):
+        async with executor.slot():
+            assert executor.running == 1
+        assert executor.running == 0
+        with pytest.raises(ValueError):
+            async with executor.slot():
+                raise ValueError("stream failed")
+        assert executor.running == 0
+    run(scenario)
+
+
+def test_background_work_waits_outside_the_queue():
+    async def scenario(executor):
+        release = threading.Event()
+
+        async def background_call(func):
+            background_work.set(True)
+            return await executor.run(func)
+
+        first = asyncio.create_task(background_call(release.wait))
+        await wait_until(lambda: executor.background_running == 1)
+        second = asyncio.create_task(background_call(lambda: "second"))
+        await asyncio.sleep(0.05)
+        # The second background call waits for a background slot, leaving the queue
+        # empty and the other worker free for interactive requests
+        assert executor.queue_depth == 0
+        assert executor.running == 1
+        assert await executor.run(lambda: "interactive") == "interactive"
+
+        release.set()
+        assert await first is True
+        assert await second == "second"
+    run(scenario, max_workers=2, max_background_workers=1)
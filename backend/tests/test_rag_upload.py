@@ -0,0 +1,83 @@
+import io
+import pytest
+from src.services.rag_service import RAGService
+
+
+def test_same_content_is_stored_once(with_rag):
+    async def scenario(rag):
+        first_id, first_new, _ = await rag.store_document("paper text", "a.pdf", {"title": "A"})
+        second_id, second_new, existing = await rag.store_document("paper text", "b.pdf", {"title": "B"})
+        assert (first_id, first_new) == ("a.pdf", True)
+        assert (second_id, second_new) == ("a.pdf", False)
+        assert existing['id'] == "a.pdf"
+        assert not await rag.document_exists("b.pdf")
+    with_rag(scenario)
+
+
+def test_file_hash_finds_the_uploaded_document(with_rag):
+    async def scenario(rag):
+        file_hash = RAGService.compute_file_hash(io.BytesIO(b"%PDF-1.7 raw bytes"))
+        await rag.store_document("paper text", "a.pdf", file_hash=file_hash)
+        existing = await rag.get_document_by_content_hash(file_hash)
+        assert existing['id'] == "a.pdf"
+        assert existing['metadata']['file_hash'] == file_hash
+    with_rag(scenario)
+
+
+def test_different_content_under_a_taken_name_gets_its_own_id(with_rag):
+    async def scenario(rag):
+        await rag.store_document("first paper", "a.pdf")
+        doc_id, is_new, _ = await rag.store_document("second paper", "a.pdf")
+        third_id, _, _ = await rag.store_document("third paper", "a.pdf")
+        assert (doc_id, is_new) == ("a_1.pdf", True)
+        assert third_id == "a_2.pdf"
+        assert (await rag.retrieve_document("a.pdf"))['text'] == "first paper"
+        assert (await rag.retrieve_document("a_1.pdf"))['text'] == "second paper"
+    with_rag(scenario)
+
+
+def test_index_is_not_updated_when_the_insert_is_ignored(with_rag):
+    async def scenario(rag):
+        await rag.store_document("first paper", "a.pdf")
+
+        # Simulates losing a race for the id: Chroma ignores the add of an existing id
+        async def taken_id(base_doc_id):
+            return "a.pdf"
+        rag._generate_unique_doc_id = taken_id
+
+        with pytest.raises(RuntimeError, match="already taken"):
+            await rag.store_document("second paper", "a.pdf")
+        assert await rag.get_document_by_content_hash(rag.compute_content_hash("second paper")) is None
+        assert (await rag.get_document_by_content_hash(rag.compute_content_hash("first paper")))['id'] == "a.pdf"
+    with_rag(scenario)
+
+
+def test_storing_fewer_chunks_drops_the_stale_ones(with_rag):
+    async def scenario(rag):
+        await rag.store_document("paper text", "a.pdf")
+        assert not await rag.has_chunks("a.pdf")
+        assert await rag.store_chunks("a.pdf", ["one", "two", "three"], [{"page": 1}] * 3) == 3
+        assert await rag.store_chunks("a.pdf", ["only"], [{"page": 1}]) == 1
+        chunks = await rag.search_chunks("only", n_results=1, parent_id="a.pdf")
+        assert [chunk['id'] for chunk in chunks] == ["a.pdf_chunk_0"]
+        assert rag.chunk_collection.get(where={"parent_id": "a.pdf"})['ids'] == ["a.pdf_chunk_0"]
+    with_rag(scenario)
+
+
+def test_update_document_moves_the_hashes_and_rebuilds_chunks(with_rag):
+    async def scenario(rag):
+        await rag.store_document("old text", "a.pdf", file_hash="old-file-hash")
+        await rag.store_chunks("a.pdf", ["old 1", "old 2"], [{"page": 1}, {"page": 2}])
+        await rag.retrieve_document("a.pdf")
+
+        assert await rag.update_document("a.pdf", "new text")
+        assert (await rag.retrieve_document("a.pdf"))['text'] == "new text"
+        assert await rag.get_document_by_content_hash(rag.compute_content_hash("old text")) is None
+        assert await rag.get_document_by_content_hash("old-file-hash") is None
+        assert (await rag.get_document_by_content_hash(rag.compute_content_hash("new text")))['id'] == "a.pdf"
+        chunks = rag.chunk_collection.get(where={"parent_id": "a.pdf"})
+        assert chunks['documents'] == ["new text"]
+        # The old text can be uploaded again as a new document
+        doc_id, is_new, _ = await rag.store_document("old text", "b.pdf")
+        assert (doc_id, is_new) == ("b.pdf", True)
+    with_rag(scenario)